@@ -0,0 +1,125 @@
+"""Registry of the Gyaan apps shown as cards on the portal, read from apps.json.
+
+Each entry has ``id``, ``title``, ``description``, ``image``, ``url``,
+``status`` (active, coming_soon or hidden) and optionally ``roles``, the
+roles allowed to see the card (everyone when omitted), and ``replicas``, more
+URLs serving the same app (``url``, if given, is the first replica). The file
+goes through json_cache, so an edit is noticed by a stat on the next access
+and takes effect without restarting the workers; it is only parsed and
+validated again when its content changed. An invalid edit is reported and the last valid
+registry stays in use.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import namedtuple
+
+import json_cache
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('active', 'coming_soon', 'hidden')
+ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+App = namedtuple('App', 'id title description image url status roles replicas')
+
+
+def parse(data):
+    """Validate the parsed apps.json and return a tuple of ``App``; raises ValueError."""
+    if not isinstance(data, dict) or not isinstance(data.get('apps'), list):
+        raise ValueError('expected an object with an "apps" list')
+    apps = []
+    seen = set()
+    for position, entry in enumerate(data['apps']):
+        where = f"apps[{position}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where}: expected an object")
+        unknown = set(entry) - set(App._fields)
+        if unknown:
+            raise ValueError(f"{where}: unknown field(s) {', '.join(sorted(unknown))}")
+        for field in ('id', 'title', 'image', 'status'):
+            if not isinstance(entry.get(field), str) or not entry[field]:
+                raise ValueError(f"{where}: {field} must be a non-empty string")
+        app_id = entry['id']
+        if not ID_PATTERN.match(app_id):
+            raise ValueError(f"{where}: invalid id {app_id!r}")
+        if app_id in seen:
+            raise ValueError(f"{where}: duplicate id {app_id!r}")
+        seen.add(app_id)
+        if entry['status'] not in STATUSES:
+            raise ValueError(f"{where}: status must be one of {', '.join(STATUSES)}")
+        url = entry.get('url', '')
+        replicas = entry.get('replicas', [])
+        if not isinstance(replicas, list):
+            raise ValueError(f"{where}: replicas must be a list of URLs")
+        for replica in ([url] if url else []) + replicas:
+            if not isinstance(replica, str) or not replica.startswith(('http://', 'https://')):
+                raise ValueError(f"{where}: {replica!r} is not an http(s) URL")
+        replicas = tuple(dict.fromkeys(([url] if url else []) + replicas))
+        if entry['status'] == 'active' and not replicas:
+            raise ValueError(f"{where}: an active app needs a url")
+        description = entry.get('description', '')
+        if not isinstance(description, str):
+            raise ValueError(f"{where}: description must be a string")
+        roles = entry.get('roles')
+        if roles is not None:
+            if not isinstance(roles, list) or not roles or not all(isinstance(role, str) and role for role in roles):
+                raise ValueError(f"{where}: roles must be a non-empty list of role names")
+            roles = frozenset(role.upper() for role in roles)
+        apps.append(App(app_id, entry['title'], description, entry['image'], replicas[0] if replicas else '',
+                        entry['status'], roles, replicas))
+    return tuple(apps)
+
+
+def visible(apps, role=None):
+    """Apps that get a card for a visitor with ``role`` (None when logged out)."""
+    role = role.upper() if role else None
+    return tuple(app for app in apps
+                 if app.status != 'hidden' and (app.roles is None or role in app.roles))
+
+
+class AppRegistry:
+    """Parsed, validated view of an apps.json file that follows edits to it.
+
+    ``on_error`` is called with the exception when the file cannot be read or
+    is invalid; the previous registry (or an empty one) is used meanwhile.
+    """
+
+    def __init__(self, path, on_error=None):
+        self.path = path
+        self._on_error = on_error
+        self._lock = threading.Lock()
+        self._source = None
+        self.apps = ()
+        self.version = ''
+
+    def snapshot(self):
+        """Return ``(apps, version)``; the version changes whenever the registry does."""
+        try:
+            data = json_cache.load(self.path, default={'apps': []})
+        except Exception as e:
+            self._error(e)
+            return self.apps, self.version
+        if data is not self._source:
+            with self._lock:
+                if data is not self._source:
+                    self._reload(data)
+        return self.apps, self.version
+
+    def _reload(self, data):
+        try:
+            apps = parse(data)
+        except ValueError as e:
+            self._source = data  # Do not re-validate the same bad content on every access
+            self._error(ValueError(f"{self.path}: {e}"))
+            return
+        self.version = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:12]
+        self.apps = apps
+        self._source = data
+
+    def _error(self, exc):
+        logger.error("App registry error: %s", exc)
+        if self._on_error is not None:
+            self._on_error(exc)
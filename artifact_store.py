@@ -0,0 +1,176 @@
+"""Content-addressed store for the images under artifacts/.
+
+artifacts/manifest.json maps each logical name (a path relative to
+artifacts/, e.g. ``admin/homescreen.PNG``) to the SHA-256 of its content and
+the file that holds those bytes. Names that share content point at a single
+blob in artifacts/store/, so the bytes are stored, published and cached once
+no matter how many instruction pages use them.
+
+    python artifact_store.py scan      # report duplicate blobs
+    python artifact_store.py rewrite   # move duplicates into the store, update the manifest
+
+Pages call ``listdir`` and ``resolve`` instead of touching artifacts/ directly;
+both fall back to the plain files when there is no manifest entry.
+"""
+import argparse
+import hashlib
+import os
+
+import json_cache
+from atomic_store import atomic_write_json
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = "artifacts"
+STORE_DIR = "store"
+MANIFEST_NAME = "manifest.json"
+SKIP_DIRS = {STORE_DIR, "thumbs"}
+
+
+def _manifest_path(root):
+    return os.path.join(root, ARTIFACTS_DIR, MANIFEST_NAME)
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _relative(path, root):
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def load_manifest(root=ROOT_DIR):
+    return json_cache.load(_manifest_path(root), default={})
+
+
+def scan(root=ROOT_DIR):
+    """Map every logical name under artifacts/ (store and thumbs excluded) to (sha256, size)."""
+    base = os.path.join(root, ARTIFACTS_DIR)
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(base):
+        if dirpath == base:
+            dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = _relative(path, base)
+            if name == MANIFEST_NAME or name.endswith('.lock'):
+                continue
+            files[name] = (_file_digest(path), os.path.getsize(path))
+    return files
+
+
+def duplicates(root=ROOT_DIR):
+    """Content stored in more than one file: {sha256: (size, logical names, stored copies)}."""
+    groups = {}
+    for name, entry in load_manifest(root).items():
+        size, names, paths = groups.setdefault(entry['sha256'], (entry['size'], set(), set()))
+        names.add(name)
+        paths.add(entry['path'])
+    for name, (digest, size) in scan(root).items():
+        _size, names, paths = groups.setdefault(digest, (size, set(), set()))
+        names.add(name)
+        paths.add(f"{ARTIFACTS_DIR}/{name}")
+    return {digest: (size, sorted(names), len(paths))
+            for digest, (size, names, paths) in groups.items() if len(paths) > 1}
+
+
+def rewrite(root=ROOT_DIR):
+    """Move duplicated content into the store and record every artifact in the manifest.
+
+    Returns the number of bytes no longer stored twice.
+    """
+    base = os.path.join(root, ARTIFACTS_DIR)
+    manifest = dict(load_manifest(root))
+    files = scan(root)
+    groups = {}
+    for name, entry in manifest.items():
+        if name not in files:
+            groups.setdefault(entry['sha256'], set()).add(name)
+    for name, (digest, _size) in files.items():
+        groups.setdefault(digest, set()).add(name)
+
+    saved = 0
+    for digest, names in groups.items():
+        names = sorted(names)
+        on_disk = [name for name in names if name in files]
+        if len(names) == 1:
+            if on_disk:
+                manifest[names[0]] = {'sha256': digest, 'size': files[names[0]][1],
+                                      'path': f"{ARTIFACTS_DIR}/{names[0]}"}
+            continue
+        size = files[on_disk[0]][1] if on_disk else manifest[names[0]]['size']
+        extension = os.path.splitext(names[0])[1].lower()
+        blob = os.path.join(base, STORE_DIR, f"{digest}{extension}")
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        for name in on_disk:
+            path = os.path.join(base, name)
+            if os.path.exists(blob):
+                os.remove(path)
+                saved += size
+            else:
+                os.replace(path, blob)
+            parent = os.path.dirname(path)
+            if parent != base and not os.listdir(parent):
+                os.rmdir(parent)
+        for name in names:
+            manifest[name] = {'sha256': digest, 'size': size, 'path': _relative(blob, root)}
+
+    manifest = {name: entry for name, entry in sorted(manifest.items())
+                if os.path.exists(os.path.join(root, entry['path']))}
+    atomic_write_json(_manifest_path(root), manifest)
+    json_cache.store(_manifest_path(root), manifest)
+    return saved
+
+
+def resolve(name, root=ROOT_DIR):
+    """Root-relative path holding the bytes of logical artifact ``name``, or None.
+
+    Names are matched case-insensitively as a last resort, as the pages were
+    written against a case-insensitive filesystem.
+    """
+    manifest = load_manifest(root)
+    entry = manifest.get(name)
+    if entry is None:
+        path = f"{ARTIFACTS_DIR}/{name}"
+        if os.path.isfile(os.path.join(root, path)):
+            return path
+        lowered = name.lower()
+        entry = next((entry for key, entry in manifest.items() if key.lower() == lowered), None)
+    return entry['path'] if entry else None
+
+
+def listdir(directory, root=ROOT_DIR):
+    """Sorted file names in logical directory ``directory`` (e.g. "admin"), from the manifest and disk."""
+    prefix = f"{directory.strip('/')}/"
+    names = {name[len(prefix):] for name in load_manifest(root) if name.startswith(prefix)}
+    path = os.path.join(root, ARTIFACTS_DIR, directory)
+    if os.path.isdir(path):
+        names.update(name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+    return sorted(name for name in names if '/' not in name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gyaan content-addressed artifact store")
+    parser.add_argument("--root", default=ROOT_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("scan", help="report artifacts that share content")
+    subparsers.add_parser("rewrite", help="move duplicated content into artifacts/store/ and update the manifest")
+    args = parser.parse_args(argv)
+
+    groups = duplicates(args.root)
+    wasted = 0
+    for digest, (size, names, copies) in sorted(groups.items()):
+        wasted += size * (copies - 1)
+        print(f"{digest[:16]} ({size:,} bytes) x{copies}: {', '.join(names)}")
+    if args.command == "scan":
+        print(f"{len(groups)} duplicated blob(s); {wasted:,} bytes stored more than once")
+    elif args.command == "rewrite":
+        saved = rewrite(args.root)
+        print(f"Rewrote {len(groups)} duplicated blob(s) into {ARTIFACTS_DIR}/{STORE_DIR}/; freed {saved:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Process-wide image cache and publisher for the portal and the instruction pages.
+
+Images can be emitted three ways (``GYAAN_ASSET_MODE``):
+
+- ``static`` (default): the file is published into ./static/ under a
+  content-hashed name and referenced as ``app/static/<name>``, served by
+  Streamlit's static file serving (``server.enableStaticServing``).
+- ``server``: same files, served by a small companion HTTP server on
+  ``GYAAN_ASSET_PORT`` with ``Cache-Control: immutable`` headers and
+  referenced through ``GYAAN_ASSET_BASE_URL``.
+- ``inline``: base64 ``data:`` URIs, as the portal originally did.
+
+Entries are keyed by the requested path and revalidated against the resolved
+file's mtime and size at most every ``check_interval`` seconds, so a rerun
+normally does no file I/O at all. Files with identical content share one
+published file / encoded string, and missing files are cached as negative
+entries.
+"""
+import base64
+import hashlib
+import mimetypes
+import os
+import shutil
+import threading
+import time
+from html import escape as html_escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT_DIR, "static")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class _Entry:
+    __slots__ = ('checked_at', 'path', 'signature', 'digest')
+
+    def __init__(self, checked_at, path, signature, digest):
+        self.checked_at = checked_at
+        self.path = path
+        self.signature = signature
+        self.digest = digest
+
+
+def _mime_type(path):
+    return mimetypes.guess_type(path)[0] or 'image/jpeg'
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class StaticPublisher:
+    """Materialize files in ``static_dir`` as ``<content hash><ext>`` and build their URLs."""
+
+    def __init__(self, static_dir, url_prefix):
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix
+
+    def publish(self, path, digest):
+        name = f"{digest[:20]}{os.path.splitext(path)[1].lower()}"
+        target = os.path.join(self.static_dir, name)
+        if not os.path.exists(target):
+            os.makedirs(self.static_dir, exist_ok=True)
+            tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"  # Sessions publish concurrently
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return f"{self.url_prefix}{name}"
+
+
+class _AssetRequestHandler(BaseHTTPRequestHandler):
+    static_dir = STATIC_DIR
+
+    def do_GET(self):
+        name = self.path.split('?', 1)[0].rsplit('/', 1)[-1]
+        if not self.path.startswith('/assets/') or not name or name.startswith('.'):
+            self.send_error(404)
+            return
+        path = os.path.join(self.static_dir, name)
+        etag = f'"{os.path.splitext(name)[0]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL)
+            self.end_headers()
+            return
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', _mime_type(name))
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL)
+        self.send_header('ETag', etag)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_asset_server(port, static_dir=STATIC_DIR, host='0.0.0.0'):
+    """Serve ``static_dir`` at /assets/ with long-lived cache headers in a daemon thread.
+
+    Returns the server, or None when the port is taken (another worker on this
+    host already serves the same content-addressed files).
+    """
+    handler = type('AssetRequestHandler', (_AssetRequestHandler,), {'static_dir': static_dir})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="asset-server", daemon=True).start()
+    return server
+
+
+class AssetCache:
+    """Resolve, hash and publish/encode each image once per process.
+
+    ``base_dirs`` are tried in order to resolve relative paths, mirroring the
+    script-dir-then-parent lookup the app always used. ``publisher`` is a
+    ``StaticPublisher`` or None for inline ``data:`` URIs.
+    """
+
+    def __init__(self, base_dirs, publisher=None, check_interval=2.0, clock=time.monotonic):
+        self.base_dirs = list(base_dirs)
+        self.publisher = publisher
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._by_digest = {}
+        self.stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'dedup_hits': 0}
+
+    def _resolve(self, image_path):
+        for base_dir in self.base_dirs:
+            path = os.path.join(base_dir, image_path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                return path, (stat.st_mtime_ns, stat.st_size)
+        return None, None
+
+    def _lookup(self, image_path):
+        now = self._clock()
+        entry = self._entries.get(image_path)
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            self._count_hit(entry)
+            return entry
+
+        path, signature = self._resolve(image_path)
+        if entry is not None and entry.path == path and entry.signature == signature:
+            entry.checked_at = now
+            self._count_hit(entry)
+            return entry
+
+        self.stats['misses'] += 1
+        digest = _file_digest(path) if path is not None else None
+        entry = _Entry(now, path, signature, digest)
+        with self._lock:
+            if digest is not None:
+                if digest in self._by_digest:
+                    self.stats['dedup_hits'] += 1
+                else:
+                    self._by_digest[digest] = {'path': path}
+            old = self._entries.get(image_path)
+            self._entries[image_path] = entry
+            if old is not None and old.digest and old.digest != digest:
+                self._drop_unused(old.digest)
+        return entry
+
+    def _count_hit(self, entry):
+        if entry.path is None:
+            self.stats['negative_hits'] += 1
+        else:
+            self.stats['hits'] += 1
+
+    def _drop_unused(self, digest):
+        if not any(entry.digest == digest for entry in self._entries.values()):
+            self._by_digest.pop(digest, None)
+
+    def _shared(self, image_path, field):
+        """Per-content value ``field`` of the image, computed once; "" if it does not exist."""
+        entry = self._lookup(image_path)
+        if entry.digest is None:
+            return ""
+        shared = self._by_digest.get(entry.digest)
+        if shared is None:
+            # Dropped concurrently because another path changed; recreate it
+            shared = self._by_digest.setdefault(entry.digest, {'path': entry.path})
+        value = shared.get(field)
+        if value is None:
+            if field == 'url':
+                value = self.publisher.publish(entry.path, entry.digest)
+            else:
+                with open(entry.path, 'rb') as f:
+                    encoded = base64.b64encode(f.read()).decode()
+                shared['base64'] = encoded
+                shared['data_uri'] = f"data:{_mime_type(entry.path)};base64,{encoded}"
+                value = shared[field]
+            shared[field] = value
+        return value
+
+    def base64(self, image_path):
+        """Base64 of the image's bytes, or "" if it does not exist."""
+        return self._shared(image_path, 'base64')
+
+    def data_uri(self, image_path):
+        """``data:`` URI for the image, or "" if it does not exist."""
+        return self._shared(image_path, 'data_uri')
+
+    def url(self, image_path):
+        """Content-hashed URL of the published image, or "" if it does not exist."""
+        return self._shared(image_path, 'url')
+
+    def src(self, image_path):
+        """Value for an ``<img src>``: the published URL, or a data URI in inline mode."""
+        if self.publisher is None:
+            return self.data_uri(image_path)
+        return self.url(image_path)
+
+
+def figure_html(image_path, caption=None, cache=None):
+    """Full-width ``<img>`` (plus caption) for st.markdown; raises FileNotFoundError if missing."""
+    src = (cache or default_cache()).src(image_path) if image_path else ""
+    if not src:
+        raise FileNotFoundError(image_path)
+    html = f'<img src="{src}" alt="{html_escape(caption or "")}" style="width: 100%;">'
+    if caption:
+        html += f'<p style="text-align: center; color: #6b7280; font-size: 0.875rem;">{html_escape(caption)}</p>'
+    return html
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide cache shared by the portal and the instruction pages, configured from the environment."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                mode = os.environ.get("GYAAN_ASSET_MODE", "static")
+                publisher = None
+                if mode == "static":
+                    publisher = StaticPublisher(STATIC_DIR, "app/static/")
+                elif mode == "server":
+                    port = int(os.environ.get("GYAAN_ASSET_PORT", "8510"))
+                    base_url = os.environ.get("GYAAN_ASSET_BASE_URL", f"http://localhost:{port}")
+                    start_asset_server(port)
+                    publisher = StaticPublisher(STATIC_DIR, f"{base_url.rstrip('/')}/assets/")
+                elif mode != "inline":
+                    raise ValueError(f"Unknown GYAAN_ASSET_MODE: {mode}")
+                _default_cache = AssetCache([ROOT_DIR, os.path.dirname(ROOT_DIR)], publisher)
+    return _default_cache
@@ -0,0 +1,158 @@
+"""Crash-safe, cross-process locked writes for the JSON data files.
+
+Writers take an exclusive ``fcntl`` lock on ``<file>.lock``, write to a temp
+file in the same directory, fsync it and rename it over the target, so a
+crash never leaves a truncated file and concurrent workers never overwrite
+each other's changes. Mutations that arrive within a short window are
+applied together and paid for with a single write and fsync.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import json_cache
+
+DEFAULT_WINDOW = 0.002
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive cross-process lock associated with ``path``."""
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _fsync_directory(path):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data, indent=2):
+    """Replace ``path`` with ``data`` via a fsync'd temp file and rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(path)
+
+
+class _Request:
+    __slots__ = ('item', 'done', 'result', 'error')
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GroupCommit:
+    """Batch items submitted from many threads into one ``flush`` call.
+
+    The first thread to arrive waits ``window`` seconds, then flushes every
+    item queued meanwhile. ``flush`` receives the list of items and returns a
+    list of per-item results; an item's result may be an exception instance,
+    which is raised in the submitting thread only.
+    """
+
+    def __init__(self, flush, window=DEFAULT_WINDOW):
+        self._flush = flush
+        self.window = window
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._leader = False
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item):
+        request = _Request(item)
+        with self._lock:
+            self._pending.append(request)
+            lead = not self._leader
+            self._leader = True
+        if lead:
+            if self.window:
+                time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._leader = False
+            self._run(batch)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self, batch):
+        with self._flush_lock:
+            try:
+                results = self._flush([request.item for request in batch])
+                for request, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        request.error = result
+                    else:
+                        request.result = result
+            except BaseException as e:
+                for request in batch:
+                    request.error = e
+            finally:
+                self.batches += 1
+                self.items += len(batch)
+                for request in batch:
+                    request.done.set()
+
+
+class JsonFileStore:
+    """Locked read-modify-write access to one JSON object file.
+
+    ``update(mutate)`` re-reads the file under the lock, so changes made by
+    other processes are never lost, applies ``mutate`` to a copy and returns
+    its result once the new contents are durably on disk.
+    """
+
+    def __init__(self, path, default=None, window=DEFAULT_WINDOW):
+        self.path = path
+        self.default = {} if default is None else default
+        self._commits = GroupCommit(self._flush, window)
+
+    def load(self):
+        """Return the current contents, served from json_cache when unchanged."""
+        return json_cache.load(self.path, default=self.default)
+
+    def update(self, mutate):
+        return self._commits.submit(mutate)
+
+    def _flush(self, mutations):
+        with file_lock(self.path):
+            json_cache.invalidate(self.path)
+            data = dict(self.load())
+            results = []
+            for mutate in mutations:
+                try:
+                    results.append(mutate(data))
+                except Exception as e:
+                    results.append(e)
+            atomic_write_json(self.path, data)
+            json_cache.store(self.path, data)
+        return results
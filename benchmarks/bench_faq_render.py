@@ -0,0 +1,108 @@
+"""Time a full page rerun with large generated FAQ files on a live ``streamlit run`` server.
+
+For each size the app directory is copied to a scratch directory, its
+faq_data.json replaced with that many generated entries, and the page rerun
+over the websocket. Reports the median script execution time (from the page
+profile) and the bytes the server sent per rerun. Run it against an older
+checkout with --app to get the "before" numbers.
+
+    python benchmarks/bench_faq_render.py --sizes 1000 10000 --rounds 10
+    python benchmarks/bench_faq_render.py --app /path/to/old/centralized_app.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from bench_fragment_reruns import ROOT_DIR, free_port, start_server
+
+WORDS = ("app login password token access report meeting document code search account session "
+         "server admin portal upload image result error network user role page help").split()
+
+
+def generate_faqs(count, seed=0):
+    rng = random.Random(seed)
+    return [{'question': f"{' '.join(rng.choices(WORDS, k=6)).capitalize()} #{number}?",
+             'answer': ' '.join(rng.choices(WORDS, k=40)).capitalize() + '.'}
+            for number in range(count)]
+
+
+async def rerun(websocket, page_script_hash):
+    """One full rerun; returns (round trip s, exec s, bytes received, page script hash)."""
+    msg = BackMsg()
+    msg.rerun_script.page_script_hash = page_script_hash
+    start = time.perf_counter()
+    await websocket.send(msg.SerializeToString())
+    exec_time = received = 0
+    while True:
+        raw = await websocket.recv()
+        received += len(raw)
+        forward = ForwardMsg()
+        forward.ParseFromString(raw)
+        kind = forward.WhichOneof('type')
+        if kind == 'new_session':
+            page_script_hash = forward.new_session.page_script_hash
+        elif kind == 'page_profile':
+            exec_time += forward.page_profile.exec_time
+        elif kind == 'script_finished' and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+            return time.perf_counter() - start, exec_time / 1e6, received, page_script_hash
+
+
+async def measure(port, rounds):
+    async with websockets.connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'],
+                                  max_size=None) as websocket:
+        page_script_hash = ''
+        for _ in range(2):  # warm caches and learn the page hash
+            *_, page_script_hash = await rerun(websocket, page_script_hash)
+        samples = []
+        for _ in range(rounds):
+            elapsed, exec_time, received, page_script_hash = await rerun(websocket, page_script_hash)
+            samples.append((elapsed, exec_time, received))
+    return {
+        'exec_ms_p50': round(statistics.median(sample[1] for sample in samples) * 1000, 2),
+        'round_trip_ms_p50': round(statistics.median(sample[0] for sample in samples) * 1000, 2),
+        'bytes_per_rerun': int(statistics.median(sample[2] for sample in samples)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=os.path.join(ROOT_DIR, 'centralized_app.py'),
+                        help='app script; its directory is copied to a scratch directory first')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='FAQ entry counts')
+    parser.add_argument('--rounds', type=int, default=10, help='reruns measured per size')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as scratch:
+            app_dir = os.path.join(scratch, 'app')
+            shutil.copytree(os.path.dirname(os.path.abspath(args.app)), app_dir,
+                            ignore=shutil.ignore_patterns('.git', '__pycache__', 'static'))
+            faq_path = os.path.join(app_dir, 'faq_data.json')
+            with open(faq_path) as f:
+                faq_data = json.load(f)
+            faq_data['faqs'] = generate_faqs(size)
+            with open(faq_path, 'w') as f:
+                json.dump(faq_data, f)
+            port = free_port()
+            server = start_server(os.path.join(app_dir, os.path.basename(args.app)), port)
+            try:
+                results[size] = asyncio.run(measure(port, args.rounds))
+            finally:
+                server.terminate()
+                server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Time the reruns triggered by the auth panel buttons on a live ``streamlit run`` server.
+
+Talks to the server over its websocket the way the browser does: a click is a
+``rerun_script`` message carrying the button's trigger and, when the button
+was rendered inside a fragment, that fragment's id. Script execution time is
+taken from the server's page profile messages; round trip is send to
+``script_finished``. Run it against an older checkout to get the "before"
+numbers, or pass --full to send every click as a full-script rerun.
+
+    python benchmarks/bench_fragment_reruns.py --rounds 20
+    python benchmarks/bench_fragment_reruns.py --app /path/to/old/centralized_app.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Login -> Sign Up -> Login -> Forgot Password? -> Login -> Cancel, back where it started
+CLICKS = ['login_btn', 'goto_signup', 'goto_login', 'goto_forgot', 'goto_login_from_forgot', 'cancel_login']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app_path, port):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.basename(app_path),
+         '--server.headless', 'true', '--server.port', str(port),
+         '--browser.gatherUsageStats', 'false'],
+        cwd=os.path.dirname(app_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('streamlit did not start')
+
+
+class Session:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.page_script_hash = ''
+        self.buttons = {}  # widget key -> (widget id, fragment id)
+
+    async def rerun(self, widget_id=None, fragment_id=''):
+        """Send one interaction; returns (round trip seconds, script execution seconds)."""
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.page_script_hash = self.page_script_hash
+        state.fragment_id = fragment_id
+        if widget_id:
+            widget = state.widget_states.widgets.add()
+            widget.id = widget_id
+            widget.trigger_value = True
+        start = time.perf_counter()
+        await self.websocket.send(msg.SerializeToString())
+        exec_time = 0
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.websocket.recv())
+            kind = forward.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = forward.new_session.page_script_hash
+            elif kind == 'delta' and forward.delta.new_element.WhichOneof('type') == 'button':
+                button = forward.delta.new_element.button
+                self.buttons[button.id.rsplit('-', 1)[-1]] = (button.id, forward.delta.fragment_id)
+            elif kind == 'page_profile':
+                exec_time += forward.page_profile.exec_time
+            elif kind == 'script_finished' and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - start, exec_time / 1e6
+
+    async def click(self, key, full=False):
+        widget_id, fragment_id = self.buttons[key]
+        return await self.rerun(widget_id, '' if full else fragment_id)
+
+
+async def measure(port, rounds, full):
+    async with websockets.connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'],
+                                  max_size=None) as websocket:
+        session = Session(websocket)
+        await session.rerun()
+        await session.rerun()  # first run warms caches and learns the page hash
+        timings = {key: [] for key in CLICKS}
+        fragment_runs = {key: session.buttons.get(key, ('', ''))[1] != '' for key in CLICKS}
+        for _ in range(rounds):
+            for key in CLICKS:
+                if key not in session.buttons:
+                    raise RuntimeError(f'button {key!r} not rendered')
+                fragment_runs[key] = not full and session.buttons[key][1] != ''
+                timings[key].append(await session.click(key, full))
+    results = {}
+    for key, samples in timings.items():
+        results[key] = {
+            'fragment': fragment_runs[key],
+            'exec_ms_p50': round(statistics.median(exec_time for _, exec_time in samples) * 1000, 2),
+            'round_trip_ms_p50': round(statistics.median(elapsed for elapsed, _ in samples) * 1000, 2),
+        }
+    all_samples = [sample for samples in timings.values() for sample in samples]
+    results['all'] = {
+        'exec_ms_p50': round(statistics.median(exec_time for _, exec_time in all_samples) * 1000, 2),
+        'round_trip_ms_p50': round(statistics.median(elapsed for elapsed, _ in all_samples) * 1000, 2),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=os.path.join(ROOT_DIR, 'centralized_app.py'),
+                        help='app script; its directory is copied to a scratch directory first')
+    parser.add_argument('--rounds', type=int, default=20, help='times to go through the click sequence')
+    parser.add_argument('--full', action='store_true', help='send every click as a full-script rerun')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        app_dir = os.path.join(scratch, 'app')
+        shutil.copytree(os.path.dirname(os.path.abspath(args.app)), app_dir,
+                        ignore=shutil.ignore_patterns('.git', '__pycache__', 'static'))
+        port = free_port()
+        server = start_server(os.path.join(app_dir, os.path.basename(args.app)), port)
+        try:
+            results = asyncio.run(measure(port, args.rounds, args.full))
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
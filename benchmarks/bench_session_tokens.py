@@ -0,0 +1,51 @@
+"""Micro-benchmark for session token signing and verification.
+
+    python benchmarks/bench_session_tokens.py --seconds 2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_tokens import KeySet, sign_token, verify_token  # noqa: E402
+
+
+def measure(fn, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(1000):
+            fn()
+        count += 1000
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help='duration of each measurement')
+    args = parser.parse_args()
+
+    keys = KeySet.from_string("2026:new-secret,2025:old-secret")
+    old_keys = KeySet.from_string("2025:old-secret")
+    token, _ = sign_token(keys, "naveen", "USER")
+    old_token, _ = sign_token(old_keys, "naveen", "USER")
+    forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    assert verify_token(token, keys) and verify_token(old_token, keys) and not verify_token(forged, keys)
+
+    results = {
+        'sign_per_second': measure(lambda: sign_token(keys, "naveen", "USER"), args.seconds),
+        'verify_per_second': measure(lambda: verify_token(token, keys), args.seconds),
+        'verify_rotated_key_per_second': measure(lambda: verify_token(old_token, keys), args.seconds),
+        'reject_forged_per_second': measure(lambda: verify_token(forged, keys), args.seconds),
+    }
+    print(json.dumps({name: round(value) for name, value in results.items()}))
+
+
+if __name__ == '__main__':
+    main()
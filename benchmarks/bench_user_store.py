@@ -0,0 +1,235 @@
+"""Latency and throughput of the user store operations behind login, signup and password reset.
+
+For every size a deterministic generator writes users.json and
+reset_tokens.json with that many users and tokens (same seed, same files),
+then each backend is opened on a fresh copy and every operation the portal's
+auth functions perform is timed call by call:
+
+- cold_load: open the store and serve the first lookup (parse + index)
+- get_user_info: get an existing user, any letter case
+- get_missing_user: get a username that does not exist
+- authenticate_user: get + password verify
+- find_by_email: the username-or-email lookup of handle_forgot_password_submit
+- create_user: hash + add a new user
+- forgot_password: find + update the password hash (handle_forgot_password_submit)
+- add_reset_token, verify_reset_token, consume_reset_token
+
+Passwords are hashed with cheap PBKDF2 by default so the store dominates;
+pass --kdf-iterations 600000 to include the production KDF cost. Results go
+to stdout and, with --out, to a JSON file; --baseline compares against an
+earlier file and exits 1 when an operation's p50 got slower than
+--max-regression times the baseline.
+
+    python benchmarks/bench_user_store.py --sizes 1000 100000 --out results.json
+    python benchmarks/bench_user_store.py --baseline results.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atomic_store import JsonFileStore  # noqa: E402
+from password_hasher import PasswordHasher, derive  # noqa: E402
+from reset_tokens import ResetTokenStore  # noqa: E402
+from user_journal import UserJournal  # noqa: E402
+from user_store import JsonUserStore, SqliteUserStore, migrate  # noqa: E402
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "bench-password"
+VALID_EXPIRY = "2099-01-01T00:00:00"
+EXPIRED_EXPIRY = "2000-01-01T00:00:00"
+
+
+def username(number):
+    return f"user{number:07d}"
+
+
+def generate(directory, size, seed, kdf_iterations):
+    """Write users.json and reset_tokens.json with ``size`` entries each; returns the token list."""
+    rng = random.Random(seed)
+    salt = hashlib.sha256(f"salt-{seed}".encode()).digest()[:16]
+    digest = derive('pbkdf2_sha256', (kdf_iterations,), PASSWORD.encode(), salt)
+    password_hash = f"pbkdf2_sha256${kdf_iterations}${salt.hex()}${digest.hex()}"
+    users = {username(number): {'password': password_hash, 'email': f"{username(number)}@example.com",
+                                'created_at': "2025-01-01T00:00:00", 'role': 'USER'}
+             for number in range(size)}
+    tokens = {}
+    for number in range(size):
+        token = base64.urlsafe_b64encode(rng.getrandbits(256).to_bytes(32, 'big')).decode().rstrip('=')
+        expiry = EXPIRED_EXPIRY if number % 10 == 0 else VALID_EXPIRY  # A tenth already expired
+        tokens[token] = {'username': username(rng.randrange(size)), 'expiry': expiry}
+    with open(os.path.join(directory, 'users.json'), 'w') as f:
+        json.dump(users, f, separators=(',', ':'))
+    with open(os.path.join(directory, 'reset_tokens.json'), 'w') as f:
+        json.dump(tokens, f, separators=(',', ':'))
+    return [token for token, data in tokens.items() if data['expiry'] == VALID_EXPIRY]
+
+
+def open_store(backend, directory):
+    if backend == 'sqlite':
+        return SqliteUserStore(os.path.join(directory, 'users.db'))
+    journal = UserJournal(os.path.join(directory, 'users.json'), os.path.join(directory, 'users.journal.jsonl'))
+
+    def append(entry):
+        journal.append(entry)
+        return True
+
+    tokens = ResetTokenStore(JsonFileStore(os.path.join(directory, 'reset_tokens.json')))
+    return JsonUserStore(journal.load, append, tokens, journal.changes)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        'count': len(samples),
+        'p50_ms': round(at(0.50), 4),
+        'p95_ms': round(at(0.95), 4),
+        'p99_ms': round(at(0.99), 4),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'ops_per_second': round(len(samples) / sum(samples), 1) if sum(samples) else None,
+    }
+
+
+def timed(fn, arguments):
+    samples = []
+    for argument in arguments:
+        start = time.perf_counter()
+        fn(argument)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def run_backend(backend, source_dir, size, tokens, args, rng):
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('users.json', 'reset_tokens.json'):
+            shutil.copy(os.path.join(source_dir, name), directory)
+        if backend == 'sqlite':
+            migrate(os.path.join(directory, 'users.json'), os.path.join(directory, 'users.journal.jsonl'),
+                    os.path.join(directory, 'reset_tokens.json'), os.path.join(directory, 'users.db'))
+        hasher = PasswordHasher('pbkdf2_sha256', pbkdf2_iterations=args.kdf_iterations, max_workers=0)
+
+        start = time.perf_counter()
+        store = open_store(backend, directory)
+        store.get(username(0))
+        store.get_reset_token(tokens[0])
+        results = {'cold_load': summarize([time.perf_counter() - start])}
+
+        existing = [username(rng.randrange(size)) for _ in range(args.read_ops)]
+        results['get_user_info'] = timed(store.get, [name.upper() if i % 2 else name
+                                                     for i, name in enumerate(existing)])
+        results['get_missing_user'] = timed(store.get, [f"nobody{i}" for i in range(args.read_ops)])
+
+        def authenticate(name):
+            user = store.get(name)
+            assert user and hasher.verify(PASSWORD, user['password'])
+        results['authenticate_user'] = timed(authenticate, existing[:args.auth_ops])
+        results['find_by_email'] = timed(store.find, [f"{name}@EXAMPLE.com" for name in existing])
+
+        def create(name):
+            ok, message = store.add(name, {'password': hasher.hash(PASSWORD), 'email': f"{name}@example.org",
+                                           'created_at': datetime.now().isoformat(), 'role': 'USER'})
+            assert ok, message
+        results['create_user'] = timed(create, [f"new{i:07d}" for i in range(args.write_ops)])
+
+        def forgot_password(email):
+            name = store.find(email)
+            assert name and store.update(name, password=hasher.hash(PASSWORD))
+        results['forgot_password'] = timed(forgot_password, [f"{name}@example.com"
+                                                             for name in existing[:args.write_ops]])
+
+        new_tokens = [f"bench-token-{i}" for i in range(args.write_ops)]
+        results['add_reset_token'] = timed(lambda token: store.add_reset_token(token, username(0), VALID_EXPIRY),
+                                           new_tokens)
+
+        def verify(token):
+            data = store.get_reset_token(token)
+            assert data and datetime.fromisoformat(data['expiry']) > datetime.now()
+        results['verify_reset_token'] = timed(verify, [rng.choice(tokens) for _ in range(args.read_ops)])
+        results['consume_reset_token'] = timed(store.consume_reset_token, new_tokens)
+        return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """List of ``backend/size/op`` whose p50 is more than ``max_regression`` times the baseline's."""
+    regressions = []
+    for backend, sizes in results['results'].items():
+        for size, operations in sizes.items():
+            for operation, stats in operations.items():
+                before = baseline.get('results', {}).get(backend, {}).get(size, {}).get(operation)
+                if before and before['p50_ms'] and stats['p50_ms'] > before['p50_ms'] * max_regression:
+                    regressions.append(f"{backend}/{size}/{operation}: {before['p50_ms']} -> {stats['p50_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100_000, 1_000_000],
+                        help='users and reset tokens to generate')
+    parser.add_argument('--backends', nargs='+', choices=['json', 'sqlite'], default=['json', 'sqlite'])
+    parser.add_argument('--read-ops', type=int, default=2000, help='calls per read operation')
+    parser.add_argument('--auth-ops', type=int, default=200, help='calls of authenticate_user')
+    parser.add_argument('--write-ops', type=int, default=20, help='calls per write operation')
+    parser.add_argument('--kdf-iterations', type=int, default=1000, help='PBKDF2 iterations of the stored hashes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='also write the results to this JSON file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=1.5,
+                        help='fail when a p50 is this many times the baseline p50')
+    args = parser.parse_args()
+
+    output = {
+        'benchmark': 'user_store',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('out', 'baseline')},
+        'results': {backend: {} for backend in args.backends},
+    }
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as source_dir:
+            start = time.perf_counter()
+            tokens = generate(source_dir, size, args.seed, args.kdf_iterations)
+            print(f"generated {size} users and tokens in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+            for backend in args.backends:
+                output['results'][backend][str(size)] = run_backend(backend, source_dir, size, tokens, args,
+                                                                    random.Random(args.seed))
+    print(json.dumps(output, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(output, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(output, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Check that ``user_store.migrate`` never drops a user silently.
+
+Builds a users.json where two users' usernames or emails differ only in
+letter case, migrates it twice (the second run must update in place) and
+checks that the conflicting users are reported as skipped while every
+other user is in the database exactly once. Exits 1 on failure.
+
+    python benchmarks/check_migrate.py
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_store import migrate  # noqa: E402
+
+USERS = {
+    'alice': {'password': 'h1', 'email': 'a@x.com', 'role': 'USER'},
+    'bob': {'password': 'h2', 'email': 'A@x.com', 'role': 'USER'},      # Email clashes with alice's
+    'Alice': {'password': 'h3', 'email': 'other@x.com', 'role': 'USER'},  # Username clashes with alice
+    'carol': {'password': 'h4', 'email': 'c@x.com', 'role': 'ADMIN'},
+}
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, name)
+                 for name in ('users.json', 'users.journal.jsonl', 'reset_tokens.json', 'users.db')}
+        with open(paths['users.json'], 'w') as f:
+            json.dump(USERS, f)
+        for run in (1, 2):
+            if run == 2:  # An exact-username re-import updates the row
+                USERS['carol']['password'] = 'h5'
+                with open(paths['users.json'], 'w') as f:
+                    json.dump(USERS, f)
+            imported, _, skipped = migrate(paths['users.json'], paths['users.journal.jsonl'],
+                                           paths['reset_tokens.json'], paths['users.db'])
+            conn = sqlite3.connect(paths['users.db'])
+            rows = dict(conn.execute("SELECT username, password FROM users"))
+            conn.close()
+            if sorted(skipped) != ['Alice', 'bob']:
+                failures.append(f"run {run}: skipped {skipped}, expected ['Alice', 'bob']")
+            if rows != {'alice': 'h1', 'carol': 'h5' if run == 2 else 'h4'}:
+                failures.append(f"run {run}: database holds {rows}")
+            if imported != len(rows):
+                failures.append(f"run {run}: reported {imported} imported, database has {len(rows)}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    print(json.dumps({'check': 'migrate', 'ok': not failures}))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""Drive many concurrent portal sessions through centralized_app.py with Streamlit's AppTest.
+
+Each simulated session runs one flow on a worker thread, in one process like
+a single Streamlit worker:
+
+- anonymous: view the home page, search the FAQ
+- login: open the login form, submit credentials
+- open_card: log in, read the signed link of the first app card, and
+  restore a session from that link's user/token the way a fresh tab does
+- signup: open the signup form, create a new account
+- reset: open the forgot-password form, reset a password
+
+Every script run is timed. The report has rerun latency percentiles (overall
+and per flow), reruns and sessions per second, failed sessions and peak RSS,
+plus the commit and parameters, so runs on different commits compare
+directly. The app runs on a scratch copy with --users seeded accounts (hashed
+with the app's configured KDF). The per-client login rate limit is lifted
+there, since every simulated session has the same client address.
+
+AppTest expects one test at a time. It installs a throwaway runtime around
+each run and recompiles the script each time. The harness gives all sessions
+one runtime and one script cache instead (see ``share_apptest_runtime``).
+
+    python benchmarks/load_apptest.py --sessions 200 --concurrency 16 --out load.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import secrets
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from password_hasher import PasswordHasher  # noqa: E402
+
+PASSWORD = "load-test-password"
+DEFAULT_MIX = "anonymous=4,login=2,open_card=2,signup=1,reset=1"
+
+
+def share_apptest_runtime():
+    """Let AppTest instances run concurrently in one process.
+
+    Each AppTest run replaces the global ``Runtime`` instance with its own
+    mock and clears it when done, which breaks any other run in flight.
+    Instead, one runtime is installed for every session and AppTest is
+    pointed at a dummy holder. The script cache, the pages/ detection and the
+    test-mode config option are shared the same way.
+    """
+    from streamlit import config
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    components = BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = components
+    Runtime._instance = runtime
+    app_test.Runtime = type('RuntimeHolder', (), {'_instance': None})
+    script_cache = ScriptCache()  # Compiles under its lock; ast.parse breaks on several threads at once
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    # AppTest resets PagesManager.uses_pages_directory before each run; a run
+    # in flight that sees the reset skips the pages/ layout and loses its clicks
+    app_test.PagesManager = type('PagesManager', (PagesManager,), {})
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda options: nullcontext()
+
+
+def prepare_app(directory, users):
+    """Copy the app into ``directory`` and seed it with ``users`` accounts sharing one password."""
+    shutil.copytree(ROOT_DIR, directory, ignore=shutil.ignore_patterns(
+        '.git', '__pycache__', 'static', 'benchmarks', 'users.json', 'users.journal.jsonl*', 'reset_tokens.json',
+        'users.db*'))
+    hasher = PasswordHasher(os.environ.get("GYAAN_PASSWORD_HASH", "scrypt"), max_workers=0)
+    password_hash = hasher.hash(PASSWORD)
+    with open(os.path.join(directory, 'users.json'), 'w') as f:
+        json.dump({f"load{number:05d}": {'password': password_hash, 'email': f"load{number:05d}@example.com",
+                                         'created_at': "2025-01-01T00:00:00", 'role': 'USER'}
+                   for number in range(users)}, f)
+
+
+class Session:
+    """One simulated browser session; ``run`` wraps AppTest runs and records their latency."""
+
+    def __init__(self, script, flow):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_file(script, default_timeout=120)
+        self.flow = flow
+        self.latencies = []
+
+    def run(self, element=None):
+        start = time.perf_counter()
+        (element or self.app).run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].message)
+        return self.app
+
+    def text_input(self, label):
+        return next(widget for widget in self.app.text_input if widget.label == label)
+
+    def submit(self):
+        return self.run(next(button for button in self.app.button if button.proto.is_form_submitter).click())
+
+    def login(self, username):
+        self.run()
+        self.run(self.app.button(key="login_btn").click())
+        self.text_input("Username").input(username)
+        self.text_input("Password").input(PASSWORD)
+        self.submit()
+        if "user" not in self.app.session_state or self.app.session_state["user"] != username:
+            raise RuntimeError(f"login failed: {[error.value for error in self.app.error]}")
+
+
+def flow_anonymous(session, number):
+    session.run()
+    session.app.text_input(key="faq_query").input("login")
+    session.run()
+
+
+def flow_login(session, number):
+    session.login(f"load{number:05d}")
+
+
+def flow_open_card(session, number):
+    session.login(f"load{number:05d}")
+    grid = next(markdown.value for markdown in session.app.markdown if 'class="card-grid"' in markdown.value)
+    href = grid.split('class="card-link" href="', 1)[1].split('"', 1)[0].replace("&amp;", "&")
+    params = {key: values[0] for key, values in parse_qs(urlsplit(href).query).items()}
+    if params.get('user') != f"load{number:05d}" or not params.get('token'):
+        raise RuntimeError(f"card link is not signed for the user: {href}")
+    restored = Session(session.app._script_path, session.flow)
+    restored.app.query_params.update(user=params['user'], token=params['token'], ts=params['ts'])
+    restored.run()
+    session.latencies.extend(restored.latencies)
+    if "user" not in restored.app.session_state or restored.app.session_state["user"] != params['user']:
+        raise RuntimeError("session was not restored from the card link")
+
+
+def flow_signup(session, number):
+    session.run()
+    session.run(session.app.button(key="signup_btn").click())
+    name = f"signup{number:06d}"
+    session.text_input("Username").input(name)
+    session.text_input("Email").input(f"{name}@example.com")
+    session.text_input("Password").input(PASSWORD)
+    session.text_input("Confirm Password").input(PASSWORD)
+    session.submit()
+    if session.app.session_state["show_signup"]:  # Success switches to the login form
+        raise RuntimeError(f"signup failed: {[error.value for error in session.app.error]}")
+
+
+def flow_reset(session, number):
+    session.run()
+    session.run(session.app.button(key="login_btn").click())
+    session.run(session.app.button(key="goto_forgot").click())
+    session.text_input("Username or Email").input(f"load{number:05d}@example.com")
+    session.text_input("New Password").input(PASSWORD)  # Same password, so later logins still work
+    session.text_input("Confirm New Password").input(PASSWORD)
+    session.submit()
+    if session.app.session_state["show_forgot_password"]:  # Success switches to the login form
+        raise RuntimeError(f"reset failed: {[error.value for error in session.app.error]}")
+
+
+FLOWS = {'anonymous': flow_anonymous, 'login': flow_login, 'open_card': flow_open_card,
+         'signup': flow_signup, 'reset': flow_reset}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r}; choose from {', '.join(FLOWS)}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {'count': len(ordered), 'p50_ms': at(0.50), 'p90_ms': at(0.90), 'p95_ms': at(0.95),
+            'p99_ms': at(0.99), 'max_ms': round(ordered[-1] * 1000, 2),
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 2)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=100, help='simulated sessions to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='sessions running at the same time')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'flow weights (default {DEFAULT_MIX})')
+    parser.add_argument('--users', type=int, default=None, help='seeded accounts (default: one per session)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out) if args.out else None
+    rng = random.Random(args.seed)
+    population = list(itertools.chain.from_iterable([name] * weight for name, weight in args.mix.items()))
+    plan = [rng.choice(population) for _ in range(args.sessions)]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        app_dir = os.path.join(scratch, 'app')
+        prepare_app(app_dir, args.users or args.sessions)
+        cwd = os.getcwd()
+        os.chdir(app_dir)
+        os.environ.setdefault("GYAAN_METRICS_PORT", "0")
+        os.environ["GYAAN_LOGIN_CLIENT_RATE"] = "1000000"
+        os.environ.setdefault("GYAAN_TOKEN_KEYS", f"load:{secrets.token_urlsafe(32)}")
+        share_apptest_runtime()
+        script = os.path.join(app_dir, 'centralized_app.py')
+        Session(script, 'warmup').run()  # Compile the script and create the cached resources once
+
+        lock = threading.Lock()
+        latencies = {name: [] for name in FLOWS}
+        failures = {}
+
+        def simulate(number):
+            flow = plan[number]
+            session = Session(script, flow)
+            try:
+                FLOWS[flow](session, number)
+            except Exception as e:
+                with lock:
+                    failures.setdefault(flow, []).append(f"{type(e).__name__}: {e}"[:200])
+            with lock:
+                latencies[flow].extend(session.latencies)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(simulate, range(args.sessions)))
+        elapsed = time.perf_counter() - start
+        os.chdir(cwd)
+
+    reruns = sum(len(samples) for samples in latencies.values())
+    report = {
+        'benchmark': 'load_apptest',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'parameters': {'sessions': args.sessions, 'concurrency': args.concurrency, 'mix': args.mix,
+                       'seed': args.seed, 'password_hash': os.environ.get("GYAAN_PASSWORD_HASH", "scrypt")},
+        'elapsed_s': round(elapsed, 2),
+        'sessions_per_second': round(args.sessions / elapsed, 2),
+        'reruns_per_second': round(reruns / elapsed, 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'rerun_latency': percentiles([sample for samples in latencies.values() for sample in samples]),
+        'by_flow': {name: {'sessions': plan.count(name), 'failed': len(failures.get(name, [])),
+                           **percentiles(samples)}
+                    for name, samples in latencies.items() if plan.count(name)},
+        'failures': {name: messages[:5] for name, messages in failures.items()},
+    }
+    print(json.dumps(report, indent=2))
+    if out:
+        with open(out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
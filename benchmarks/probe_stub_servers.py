@@ -0,0 +1,114 @@
+"""Run the health prober against local stub servers and check the badges it produces.
+
+Stubs: a healthy server, a slow one, one answering 500, one that accepts
+connections but never answers, and a closed port. After a few seconds every
+target must have the expected state, the healthy targets must have been
+probed over reused keep-alive connections, and the failing targets must have
+been probed less often (exponential backoff). Exits 1 otherwise.
+
+    python benchmarks/probe_stub_servers.py --seconds 4
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from health_probe import HealthProber  # noqa: E402
+
+
+def stub_server(delay=0.0, status=200):
+    hits = {'requests': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            hits['requests'] += 1
+            time.sleep(delay)
+            body = b'ok'
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", hits
+
+
+def hanging_server():
+    """Accepts connections and never answers; counts connection attempts."""
+    hits = {'requests': 0}
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(64)
+    held = []
+
+    def accept():
+        while True:
+            connection, _ = listener.accept()
+            held.append(connection)
+            hits['requests'] += 1
+
+    threading.Thread(target=accept, daemon=True).start()
+    return f"http://127.0.0.1:{listener.getsockname()[1]}", hits
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=4.0, help='how long to let the prober run')
+    args = parser.parse_args()
+
+    healthy, healthy_hits = stub_server()
+    slow, _ = stub_server(delay=0.3)
+    failing, _ = stub_server(status=500)
+    hanging, hanging_hits = hanging_server()
+    closed = closed_port()
+    expected = {healthy: 'up', slow: 'degraded', failing: 'degraded', hanging: 'down', closed: 'down'}
+
+    prober = HealthProber(lambda: list(expected), interval=0.2, timeout=0.5, degraded_latency=0.2,
+                          max_backoff=2.0, health_path='/')
+    prober.start()
+    time.sleep(args.seconds)
+    prober.stop()
+
+    version, states = prober.snapshot()
+    start = time.perf_counter()
+    for _ in range(100_000):
+        prober.snapshot()
+    snapshot_us = (time.perf_counter() - start) / 100_000 * 1e6
+
+    names = {healthy: 'healthy', slow: 'slow', failing: 'http_500', hanging: 'hanging', closed: 'closed'}
+    results = {
+        'states': {names[url]: states.get(url) for url in expected},
+        'healthy_probes': healthy_hits['requests'],
+        'hanging_probes': hanging_hits['requests'],
+        'snapshot_us': round(snapshot_us, 3),
+        **prober.stats,
+    }
+    print(json.dumps(results, indent=2))
+
+    ok = (all(states.get(url) == state for url, state in expected.items())
+          and prober.stats['connections_reused'] > 0
+          and hanging_hits['requests'] < healthy_hits['requests'])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Simulate users opening an app with three replicas and check how the selector spreads them.
+
+Stubs: a fast replica, a slow one and one failing a share of its health
+checks with a 500. The health prober runs against them for a while, then
+``--users`` users each get a replica. The fast replica must take the most
+users but not all of them, the flaky one the fewest, every user must get the
+same replica again on the next render, and after the fast replica is killed
+its users (and only they) must move to the others, mostly to the slow one. Prints the distribution as JSON; exits 1 otherwise.
+
+    python benchmarks/simulate_replica_selection.py --users 1000
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_registry import App  # noqa: E402
+from health_probe import HealthProber  # noqa: E402
+from replica_selector import ReplicaSelector  # noqa: E402
+
+
+def stub_replica(delay=0.0, fail_every=0):
+    """Replica stub; set ``control['alive']`` to False to make it drop connections like a dead server."""
+    control = {'alive': True, 'requests': 0}
+    counter = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if not control['alive']:
+                self.close_connection = True
+                return
+            control['requests'] += 1
+            time.sleep(delay)
+            status = 500 if fail_every and next(counter) % fail_every == 0 else 200
+            body = b'ok'
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    control['server'] = server
+    return f"http://127.0.0.1:{server.server_address[1]}", control
+
+
+def kill(control):
+    control['alive'] = False
+    control['server'].shutdown()
+    control['server'].server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000, help='number of simulated users')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds of probing before users arrive')
+    args = parser.parse_args()
+
+    fast, fast_control = stub_replica(delay=0.01)
+    slow, _ = stub_replica(delay=0.08)
+    flaky, _ = stub_replica(delay=0.01, fail_every=3)
+    names = {fast: 'fast', slow: 'slow', flaky: 'flaky_500'}
+    app = App('demo', 'Demo', '', 'demo.png', fast, 'active', None, (fast, slow, flaky))
+
+    prober = HealthProber(lambda: list(app.replicas), interval=0.1, timeout=0.5, degraded_latency=0.5,
+                          max_backoff=0.5, health_path='/')
+    prober.start()
+    time.sleep(args.warmup)
+    selector = ReplicaSelector(prober)
+    users = [f"user{number}" for number in range(args.users)]
+
+    start = time.perf_counter()
+    first = {user: selector.pick(app, user) for user in users}
+    pick_us = (time.perf_counter() - start) / len(users) * 1e6
+    again = {user: selector.pick(app, user.upper()) for user in users}
+    before = {names[url]: count for url, count in selector.sessions().items()}
+
+    kill(fast_control)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and (prober.get(fast) is None or prober.get(fast).state != 'down'):
+        time.sleep(0.05)
+    after_kill = {user: selector.pick(app, user) for user in users}
+    prober.stop()
+    after = {names[url]: count for url, count in selector.sessions().items()}
+
+    moved = [user for user in users if after_kill[user] != first[user]]
+    results = {
+        'health': {names[url]: dict(prober.get(url)._asdict()) if prober.get(url) else None for url in app.replicas},
+        'sessions_before_kill': before,
+        'sessions_after_kill': after,
+        'sticky_on_rerender': sum(first[user] == again[user] for user in users),
+        'moved_after_kill': len(moved),
+        'pick_us': round(pick_us, 2),
+        **selector.stats,
+    }
+    print(json.dumps(results, indent=2, default=str))
+
+    ok = (before.get('fast', 0) == max(before.values()) and before.get('fast', 0) < len(users)
+          and len(before) > 1
+          and results['sticky_on_rerender'] == len(users)
+          and all(first[user] == fast for user in moved)
+          and len(moved) == before.get('fast', 0)
+          and 'fast' not in after
+          and before.get('flaky_500', 0) < before.get('slow', 0)
+          and after.get('flaky_500', 0) < after.get('slow', 0))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
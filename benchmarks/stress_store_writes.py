@@ -0,0 +1,138 @@
+"""Multi-process stress test for the locked JSON stores.
+
+Spawns several worker processes, each running several threads, that all
+write to the same reset-tokens style JSON file (through JsonFileStore) and
+the same users journal (through UserJournal). Afterwards every written key
+must be present, proving no update was lost, and throughput is reported.
+
+Journal workers also race to sign up the same usernames and the same emails
+(in different letter case). Each name and each email must be accepted
+exactly once, and the stored record must be the accepted one.
+
+    python benchmarks/stress_store_writes.py --processes 4 --threads 8 --writes 50
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atomic_store import JsonFileStore  # noqa: E402
+from user_directory import DuplicateUserError  # noqa: E402
+from user_journal import UserJournal  # noqa: E402
+
+
+def worker(kind, directory, process_index, threads, writes, queue):
+    if kind == 'json':
+        store = JsonFileStore(os.path.join(directory, 'tokens.json'))
+    else:
+        store = UserJournal(os.path.join(directory, 'users.json'), os.path.join(directory, 'users.journal.jsonl'))
+
+    accepted = []  # (username, email) of the contested signups that succeeded here
+    accepted_lock = threading.Lock()
+
+    def signup(username, email):
+        try:
+            store.append({'op': 'create', 'username': username, 'data': {'password': '', 'email': email}})
+        except DuplicateUserError:
+            return
+        with accepted_lock:
+            accepted.append((username, email))
+
+    def write(thread_index):
+        for i in range(writes):
+            key = f"p{process_index}-t{thread_index}-{i}"
+            if kind == 'json':
+                store.update(lambda tokens, key=key: tokens.__setitem__(key, {'username': key, 'expiry': ''}))
+            else:
+                store.append({'op': 'create', 'username': key, 'data': {'password': '', 'email': f"{key}@example.com"}})
+                if i % 100 == 99 and thread_index == 0:
+                    store.compact()
+                tag = f"p{process_index}-t{thread_index}-{i}"
+                signup(f"DUP-{i}" if process_index % 2 else f"dup-{i}", f"{tag}@dup.example.com")
+                signup(f"mail-{tag}", f"SHARED-{i}@example.com" if thread_index % 2 else f"shared-{i}@example.com")
+
+    pool = [threading.Thread(target=write, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    commits = store._commits
+    queue.put((commits.batches, commits.items, accepted))
+
+
+def run(kind, processes, threads, writes):
+    directory = tempfile.mkdtemp(prefix='gyaan-stress-')
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(kind, directory, p, threads, writes, queue))
+               for p in range(processes)]
+    start = time.perf_counter()
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - start
+    batches = items = 0
+    accepted = []
+    for _ in workers:
+        b, i, a = queue.get()
+        batches += b
+        items += i
+        accepted.extend(a)
+
+    if kind == 'json':
+        with open(os.path.join(directory, 'tokens.json')) as f:
+            stored = json.load(f)
+    else:
+        stored = UserJournal(os.path.join(directory, 'users.json'),
+                             os.path.join(directory, 'users.journal.jsonl')).load()
+    expected = {f"p{p}-t{t}-{i}" for p in range(processes) for t in range(threads) for i in range(writes)}
+    missing = expected - set(stored)
+    duplicate_errors = 0
+    if kind == 'journal':
+        for i in range(writes):
+            names = [(name, email) for name, email in accepted if name.lower() == f"dup-{i}"]
+            emails = [(name, email) for name, email in accepted if email.lower() == f"shared-{i}@example.com"]
+            stored_emails = [name for name, data in stored.items()
+                             if data.get('email', '').lower() == f"shared-{i}@example.com"]
+            if len(names) != 1 or stored.get(names[0][0], {}).get('email') != names[0][1]:
+                duplicate_errors += 1
+            if len(emails) != 1 or stored_emails != [emails[0][0]]:
+                duplicate_errors += 1
+        missing |= {name for name, _ in accepted} - set(stored)
+    return {
+        'store': kind,
+        'writes': len(expected),
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(len(expected) / elapsed, 1),
+        'fsync_batches': batches,
+        'mean_batch_size': round(items / batches, 2) if batches else 0,
+        'lost_updates': len(missing),
+        'duplicate_errors': duplicate_errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=50, help='writes per thread')
+    parser.add_argument('--store', choices=['json', 'journal', 'all'], default='all')
+    args = parser.parse_args()
+
+    kinds = ['json', 'journal'] if args.store == 'all' else [args.store]
+    failed = False
+    for kind in kinds:
+        result = run(kind, args.processes, args.threads, args.writes)
+        print(json.dumps(result))
+        failed = failed or result['lost_updates'] > 0 or result['duplicate_errors'] > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
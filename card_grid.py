@@ -0,0 +1,112 @@
+"""Pre-rendered HTML for the whole app-card grid.
+
+The grid's markup only depends on the app registry, the apps' health badges
+and on who is looking (logged out, or logged in with some role), so it is
+built once per (registry version, health version, logged in, role) and
+cached. The per-user part of the links (user, token, ts) is left as a
+placeholder in the template and filled in with a single ``str.replace``, so a
+render costs the same no matter how many cards there are, and the grid goes
+out as one st.markdown element. Apps with several replicas get one more
+placeholder for the link target, filled in with the replica picked for the
+user.
+"""
+import html
+import threading
+from urllib.parse import urlencode
+
+import app_registry
+
+AUTH_PLACEHOLDER = "\x00auth\x00"
+LOGIN_HREF = "?login=1"  # Read by the app on startup to open the login form
+BADGES = {'up': "Up", 'degraded': "Degraded", 'down': "Down"}
+
+
+def _url_placeholder(app):
+    return f"\x00url:{app.id}\x00"
+
+
+def _link(url):
+    separator = "&amp;" if "?" in url else "?"
+    return f"{html.escape(url)}{separator}"
+
+
+def _app_state(app, states):
+    """Badge state of an app: that of its healthiest replica."""
+    replica_states = [states.get(url) for url in app.replicas]
+    return next((state for state in BADGES if state in replica_states), None)
+
+
+def image_html(src, srcset="", sources=()):
+    """The card ``<img>``; with ``sources`` ((MIME type, srcset) the browser may prefer) a ``<picture>``."""
+    img = f'<img src="{html.escape(src)}" class="card-image"'
+    if srcset:
+        img += f' srcset="{html.escape(srcset)}"'
+    img += '>'
+    if not sources:
+        return img
+    source_tags = "".join(f'<source type="{mime_type}" srcset="{html.escape(source_srcset)}">'
+                          for mime_type, source_srcset in sources)
+    return f'<picture>{source_tags}{img}</picture>'
+
+
+def _card_html(app, image, logged_in, state=None):
+    title = html.escape(app.title)
+    badge = ""
+    if app.status == 'active' and state in BADGES:
+        badge = f'<span class="status-badge status-{state}">● {BADGES[state]}</span>'
+    if app.status == 'coming_soon':
+        action = f'<span class="card-link card-link-disabled" title="{title} - Coming Soon">Coming Soon</span>'
+    elif logged_in:
+        href = _url_placeholder(app) if len(app.replicas) > 1 else _link(app.url)
+        action = (f'<a class="card-link" href="{href}{AUTH_PLACEHOLDER}" '
+                  f'target="_blank" rel="noopener noreferrer">Open {title}</a>')
+    else:
+        action = (f'<a class="card-link" href="{LOGIN_HREF}" target="_self" '
+                  f'title="Login required to access this app">Open {title}</a>')
+    return (f'<div class="card-cell"><div class="stCard">{badge}{image}'
+            f'<p class="card-title">{title}<br><span style=\'font-size:0.85em\'>{html.escape(app.description)}</span></p>'
+            f'</div>{action}</div>')
+
+
+class CardGridRenderer:
+    """Builds and caches the grid template; ``image_html`` maps an app's image path to its card image markup."""
+
+    def __init__(self, image_html, max_templates=16):
+        self.image_html = image_html
+        self.max_templates = max_templates
+        self._templates = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'builds': 0}
+
+    def template(self, apps, version, logged_in, role=None, health=(None, {})):
+        """``health`` is a ``health_probe.HealthProber.snapshot()``: (version, {url: state})."""
+        health_version, states = health
+        key = (version, health_version, logged_in, role)
+        template = self._templates.get(key)
+        if template is not None:
+            self.stats['hits'] += 1
+            return template
+        cells = "".join(_card_html(app, self.image_html(app.image), logged_in, _app_state(app, states))
+                        for app in app_registry.visible(apps, role if logged_in else None))
+        template = f'<div class="card-grid">{cells}</div>'
+        with self._lock:
+            if len(self._templates) >= self.max_templates:
+                # Templates of older registry versions are never asked for again
+                self._templates.pop(next(iter(self._templates)))
+            self._templates[key] = template
+            self.stats['builds'] += 1
+        return template
+
+    def render(self, apps, version, username=None, role=None, token="", ts="", health=(None, {}), pick=None):
+        """Grid HTML for the current visitor; app links carry user, token and ts when logged in.
+
+        ``pick(app)`` returns the replica URL to link for an app with several
+        replicas; the first replica is used without it.
+        """
+        template = self.template(apps, version, bool(username), role, health)
+        if not username:
+            return template
+        for app in apps:
+            if len(app.replicas) > 1:
+                template = template.replace(_url_placeholder(app), _link(pick(app) if pick else app.url))
+        return template.replace(AUTH_PLACEHOLDER, html.escape(urlencode({'user': username, 'token': token, 'ts': ts})))
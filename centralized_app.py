@@ -1,28 +1,85 @@
 import streamlit as st
-import base64
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import math
 import os
-import hashlib
 import time
-import json
 from datetime import datetime, timedelta
 import secrets
 
+import json_cache
+import metrics
+import thumbnails
+from artifact_store import resolve as resolve_artifact
+from assets import default_cache
+from app_registry import AppRegistry
+from atomic_store import JsonFileStore, atomic_write_json
+from card_grid import CardGridRenderer, image_html as card_image_html
+from faq_search import FaqIndex
+from health_probe import HealthProber
+from replica_selector import ReplicaSelector
+from password_hasher import PasswordHasher
+from perf_timing import default_timer
+from profiler import default_profiler
+from rate_limiter import AdmissionController
+from reset_tokens import ResetTokenStore, start_sweeper
+from session_tokens import KeySet, sign_token, verify_token
+from user_directory import DuplicateUserError
+from user_journal import UserJournal
+from user_store import JsonUserStore, SqliteUserStore
+
 # --- Page Configuration ---
 st.set_page_config(page_title="Home - Gyaan Apps", layout="wide")
+timer = default_timer()  # Section timings for the admin performance page (GYAAN_PERF_TIMING=0 disables)
+timer.begin_run()
+metrics.RERUNS.labels("full").inc()
+if get_script_run_ctx() is not None:
+    metrics.SESSIONS.touch(get_script_run_ctx().session_id)
 
 # --- Constants ---
 USERS_FILE = "users.json"
+USERS_JOURNAL_FILE = "users.journal.jsonl"
 RESET_TOKENS_FILE = "reset_tokens.json"
 FAQ_FILE = "faq_data.json"
+FAQ_PAGE_SIZE = max(1, int(os.environ.get("GYAAN_FAQ_PAGE_SIZE", "10")))  # FAQ entries rendered per page
+APPS_FILE = "apps.json"
+HEALTH_PROBE_INTERVAL = float(os.environ.get("GYAAN_HEALTH_PROBE_INTERVAL", "15"))  # seconds
+# Login attempts allowed per client (IP) per minute; raise behind a proxy that hides client addresses
+LOGIN_CLIENT_RATE = float(os.environ.get("GYAAN_LOGIN_CLIENT_RATE", "30"))
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 ignores the header
+TRUSTED_PROXY_HOPS = int(os.environ.get("GYAAN_TRUSTED_PROXY_HOPS", "0"))
+METRICS_HOST = os.environ.get("GYAAN_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("GYAAN_METRICS_PORT", "9464"))  # Prometheus /metrics, next free port per worker; 0 disables
+USER_DB_FILE = os.environ.get("GYAAN_USER_DB", "users.db")
+USER_STORE_BACKEND = os.environ.get("GYAAN_USER_STORE", "json")  # "json" or "sqlite"
+PASSWORD_HASH_ALGORITHM = os.environ.get("GYAAN_PASSWORD_HASH", "scrypt")  # "scrypt" or "pbkdf2_sha256"
+PASSWORD_HASH_WORKERS = int(os.environ["GYAAN_PASSWORD_HASH_WORKERS"]) if "GYAAN_PASSWORD_HASH_WORKERS" in os.environ else None
+
+# Session token keys, "kid:secret,..." with the signing key first (see session_tokens.py). Shared
+# with the Gyaan apps; rotate by putting a new key first and dropping the old one after
+# SESSION_TOKEN_TTL. There is no default: without it no tokens are issued or accepted.
+TOKEN_KEYS = os.environ.get("GYAAN_TOKEN_KEYS", "")
+SESSION_TOKEN_TTL = 12 * 3600  # seconds
+
+@st.cache_resource
+def get_token_keys():
+    """Process-wide key set used to sign and verify session tokens; None when GYAAN_TOKEN_KEYS is unset."""
+    return KeySet.from_string(TOKEN_KEYS) if TOKEN_KEYS else None
+
+TOKEN_KEYS_MISSING = "Signed session links are disabled: GYAAN_TOKEN_KEYS is not configured on this portal."
 
 # --- Query Param Persistence ---
+# Only restore a session from the URL when it carries a valid, unexpired token for that user
 query_params = st.query_params
 if "user" in query_params and "user" not in st.session_state:
-    st.session_state["user"] = query_params["user"]
-if "token" in query_params and "token" not in st.session_state:
-    st.session_state["token"] = query_params["token"]
-if "ts" in query_params and "ts" not in st.session_state:
-    st.session_state["ts"] = query_params["ts"]
+    token_keys = get_token_keys()
+    claims = verify_token(query_params.get("token", ""), token_keys) if token_keys else None
+    if token_keys is None:
+        st.error(TOKEN_KEYS_MISSING)
+    elif claims and claims["sub"] == query_params["user"].lower():
+        st.session_state["user"] = query_params["user"]
+        st.session_state["token"] = query_params["token"]
+        st.session_state["ts"] = str(claims["exp"])
+        st.session_state["role"] = claims["role"]
 
 # Initialize session state variables
 if "show_login" not in st.session_state:
@@ -32,7 +89,26 @@ if "show_signup" not in st.session_state:
 if "show_forgot_password" not in st.session_state:
     st.session_state["show_forgot_password"] = False
 
+# Card links for logged-out visitors come back with ?login=1 to open the login form
+if "login" in query_params:
+    if "user" not in st.session_state:
+        st.session_state["show_login"] = True
+    del st.query_params["login"]
+
+# Admins profile their own next N reruns with ?profile=N (other users' from the performance page)
+profiler = default_profiler()
+if "profile" in query_params:
+    if st.session_state.get('role', '').upper() == 'ADMIN':
+        try:
+            profiler.arm(st.session_state["user"], int(query_params["profile"]))
+        except ValueError:
+            pass
+    del st.query_params["profile"]
+profile = profiler.start(st.session_state.get("user"))
+
+
 
+timer.lap("session_restore")
 
 # Hide sidebar, sidebar nav, sidebar arrow SVG, and sidebar collapse button
 st.markdown("""
@@ -213,6 +289,83 @@ st.markdown("""
         margin: 0 auto;
     }
 
+    /* App cards are rendered as one element, laid out like three st.columns */
+    .card-grid {
+        display: grid;
+        grid-template-columns: repeat(3, minmax(0, 1fr));
+        gap: 1rem;
+    }
+
+    @media (max-width: 640px) {
+        .card-grid {
+            grid-template-columns: minmax(0, 1fr);
+        }
+    }
+
+    .card-cell {
+        margin-bottom: 1rem;
+    }
+
+    .card-link, .card-link:hover, .card-link:visited {
+        display: block;
+        text-align: center;
+        background: #3B82F6;
+        color: white !important;
+        padding: 10px 0;
+        border-radius: 6px;
+        text-decoration: none !important;
+        font-weight: 500;
+        margin-top: 8px;
+    }
+
+    .card-link-disabled {
+        background: #9CA3AF;
+        cursor: default;
+    }
+
+    .stCard {
+        position: relative;
+    }
+
+    .stCard picture {display: contents;}
+
+    .status-badge {
+        position: absolute;
+        top: 8px;
+        right: 8px;
+        padding: 2px 8px;
+        border-radius: 9999px;
+        font-size: 0.75em;
+        font-weight: 600;
+        background: white;
+        border: 1px solid #E5E7EB;
+    }
+
+    .status-up {color: #059669;}
+    .status-degraded {color: #D97706;}
+    .status-down {color: #DC2626;}
+
+    /* FAQ entries are one HTML element per page, styled like st.expander */
+    .faq-item {
+        border: 1px solid #E5E7EB;
+        border-radius: 8px;
+        margin-bottom: 8px;
+        background: white;
+    }
+
+    .faq-item summary {
+        cursor: pointer;
+        padding: 12px 16px;
+        font-weight: 500;
+    }
+
+    .faq-answer {
+        padding: 0 16px 12px;
+        color: #374151;
+    }
+
+    .faq-answer > :last-child {margin-bottom: 0;}
+
     .footer {
         text-align: center;
         font-size: 14px;
@@ -310,102 +463,98 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+timer.lap("css")
+
 # --- User Management Functions ---
+@st.cache_resource
+def get_user_journal():
+    """Process-wide users snapshot + change journal, compacted in the background."""
+    journal = UserJournal(USERS_FILE, USERS_JOURNAL_FILE)
+    journal.start_compactor()
+    return journal
+
+@timer.timed()
 def load_users():
-    """Load users from JSON file."""
+    """Load users from the snapshot file and replay the change journal."""
     try:
-        if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+        with metrics.USERS_LOAD_SECONDS.time():
+            return get_user_journal().load()
     except Exception as e:
         st.error(f"Error loading users: {e}")
         return {}
 
-def save_users(users):
-    """Save users to JSON file."""
+def user_changes(since):
+    """Users changed by journal entries since ``since`` (see UserJournal.changes)."""
+    return get_user_journal().changes(since)
+
+def append_user_change(entry):
+    """Append one user change to the journal."""
     try:
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users, f, indent=2)
+        with metrics.USERS_SAVE_SECONDS.time():
+            get_user_journal().append(entry)
         return True
+    except DuplicateUserError:
+        raise  # Reported by the user store as "already exists"
     except Exception as e:
         st.error(f"Error saving users: {e}")
         return False
 
+@st.cache_resource
+def get_password_hasher():
+    """Process-wide password hasher backed by a bounded pool of KDF workers."""
+    return PasswordHasher(PASSWORD_HASH_ALGORITHM, max_workers=PASSWORD_HASH_WORKERS)
+
 def hash_password(password):
-    """Hash password using SHA256."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password with a salted KDF (scrypt by default)."""
+    with metrics.PASSWORD_SECONDS.labels("hash").time():
+        return get_password_hasher().hash(password)
 
 def verify_password(password, hashed_password):
-    """Verify password against hash."""
-    return hash_password(password) == hashed_password
+    """Verify password against hash (KDF or legacy SHA256)."""
+    with metrics.PASSWORD_SECONDS.labels("verify").time():
+        return get_password_hasher().verify(password, hashed_password)
 
+@timer.timed()
 def create_user(username, password, email):
     """Create a new user."""
-    users = load_users()
     username = username.lower()
     
-    # Check if user already exists (case insensitive)
-    username_lower = username.lower()
-    email_lower = email.lower()
-    
-    for existing_user in users.keys():
-        if existing_user.lower() == username_lower:
-            return False, "Username already exists"
-    
-    # Check if email already exists (case insensitive)
-    for user_data in users.values():
-        if user_data.get('email', '').lower() == email_lower:
-            return False, "Email already exists"
-    
-    # Create new user (store original case but check case insensitive)
-    users[username] = {
+    # Username and email uniqueness is checked case insensitive by the store
+    return get_user_store().add(username, {
         'password': hash_password(password),
         'email': email,
         'created_at': datetime.now().isoformat(),
         'role': 'USER'
-    }
-    
-    if save_users(users):
-        return True, "User created successfully"
-    else:
-        return False, "Error creating user"
+    })
 
+@timer.timed()
 def authenticate_user(username, password):
     """Authenticate user with username and password (case insensitive)."""
-    users = load_users()
-    username_lower = username.lower()
-    
-    # Find user with case insensitive comparison
-    actual_username = None
-    for user in users.keys():
-        if user.lower() == username_lower:
-            actual_username = user
-            break
+    store = get_user_store()
+    user_data = store.get(username)
+    if not user_data:
+        return False
     
-    if not actual_username:
+    if not verify_password(password, user_data['password']):
         return False
     
-    return verify_password(password, users[actual_username]['password'])
+    # Upgrade legacy SHA256 hashes (or hashes with an outdated cost) now that we know the password
+    if get_password_hasher().needs_rehash(user_data['password']):
+        store.update(username, password=hash_password(password))
+    return True
 
 def get_user_info(username):
     """Get user information (case insensitive)."""
-    users = load_users()
-    username_lower = username.lower()
-    
-    # Find user with case insensitive comparison
-    for user, data in users.items():
-        if user.lower() == username_lower:
-            return data
-    return {}
+    return get_user_store().get(username) or {}
 
 # --- FAQ and About Functions ---
+@timer.timed()
 def load_faq_data():
-    """Load FAQ and About data from JSON file."""
+    """Load FAQ and About data from JSON file (cached until the file changes)."""
     try:
-        if os.path.exists(FAQ_FILE):
-            with open(FAQ_FILE, 'r') as f:
-                return json.load(f)
+        faq_data = json_cache.load(FAQ_FILE)
+        if faq_data is not None:
+            return faq_data
         else:
             # Create default FAQ file if it doesn't exist
             default_data = {
@@ -420,124 +569,145 @@ def load_faq_data():
                     "content": "Gyaan is an innovative AI-powered platform developed by Team GYAAN."
                 }
             }
-            with open(FAQ_FILE, 'w') as f:
-                json.dump(default_data, f, indent=2)
+            atomic_write_json(FAQ_FILE, default_data)
+            json_cache.store(FAQ_FILE, default_data)
             return default_data
     except Exception as e:
         st.error(f"Error loading FAQ data: {e}")
         return {"faqs": [], "about": {"title": "About Gyaan", "content": "Content not available."}}
 
-# --- Reset Token Functions ---
-def load_reset_tokens():
-    """Load reset tokens from JSON file."""
-    try:
-        if os.path.exists(RESET_TOKENS_FILE):
-            with open(RESET_TOKENS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        st.error(f"Error loading reset tokens: {e}")
-        return {}
-
-def save_reset_tokens(tokens):
-    """Save reset tokens to JSON file."""
-    try:
-        with open(RESET_TOKENS_FILE, 'w') as f:
-            json.dump(tokens, f, indent=2)
-        return True
-    except Exception as e:
-        st.error(f"Error saving reset tokens: {e}")
-        return False
+# --- User Store ---
+@st.cache_resource
+def get_user_store():
+    """Process-wide user store for the configured backend, with its reset token sweeper."""
+    if USER_STORE_BACKEND == "sqlite":
+        store = SqliteUserStore(USER_DB_FILE, on_error=lambda e: st.error(f"Error accessing user database: {e}"))
+    else:
+        reset_tokens = ResetTokenStore(JsonFileStore(RESET_TOKENS_FILE),
+                                       on_error=lambda e: st.error(f"Error saving reset tokens: {e}"))
+        store = JsonUserStore(load_users, append_user_change, reset_tokens, user_changes)
+    start_sweeper(store.sweep_reset_tokens)
+    return store
 
+# --- Reset Token Functions ---
 def generate_reset_token(username):
     """Generate a password reset token."""
     token = secrets.token_urlsafe(32)
     expiry = (datetime.now() + timedelta(hours=1)).isoformat()
     
-    tokens = load_reset_tokens()
-    tokens[token] = {
-        'username': username,
-        'expiry': expiry
-    }
-    
-    if save_reset_tokens(tokens):
+    if get_user_store().add_reset_token(token, username, expiry):
         return token
     return None
 
+@timer.timed()
 def verify_reset_token(token):
     """Verify and return username for reset token."""
-    tokens = load_reset_tokens()
+    store = get_user_store()
+    token_data = store.get_reset_token(token)
     
-    if token not in tokens:
+    if token_data is None:
         return None
     
-    token_data = tokens[token]
     expiry = datetime.fromisoformat(token_data['expiry'])
     
     if datetime.now() > expiry:
         # Token expired, remove it
-        del tokens[token]
-        save_reset_tokens(tokens)
+        store.delete_reset_token(token)
         return None
     
     return token_data['username']
 
+@timer.timed()
 def reset_password(token, new_password):
     """Reset user password using token."""
-    username = verify_reset_token(token)
+    # Look up and remove the token in one step so it can only be used once
+    store = get_user_store()
+    username = store.consume_reset_token(token)
     if not username:
         return False, "Invalid or expired token"
     
-    users = load_users()
-    if username not in users:
+    if store.get_username(username) is None:
         return False, "User not found"
     
     # Update password
-    users[username]['password'] = hash_password(new_password)
-    
-    # Remove used token
-    tokens = load_reset_tokens()
-    if token in tokens:
-        del tokens[token]
-        save_reset_tokens(tokens)
-    
-    if save_users(users):
+    if store.update(username, password=hash_password(new_password)):
         return True, "Password reset successfully"
     else:
         return False, "Error resetting password"
 
 # --- Token Generation Function ---
-def generate_user_token(username):
-    """Generate a secure token for user authentication."""
-    # print(username)
-    username = username.lower()
-    secret_key = "GYAAN_SECRET_KEY_2025"
-    token_string = f"{username}:{secret_key}"
-    # print(token_string)
-    token = hashlib.sha256(token_string.encode()).hexdigest()
-    timestamp = "STATIC"
-    # print("User data : ", username)
-    # print("Secreate key: ", secret_key)
-    # print("Generated Token = ", token)
-    return token, timestamp
-
-# --- Get Base64 Image Function ---
+@timer.timed()
+def generate_user_token(username, role='USER'):
+    """Generate a signed, expiring token for user authentication.
+    
+    Returns the token and its expiry (Unix seconds) as the ``ts`` link parameter,
+    or empty strings when no keys are configured.
+    """
+    if get_token_keys() is None:
+        return "", ""
+    token, expiry = sign_token(get_token_keys(), username.lower(), role, ttl=SESSION_TOKEN_TTL)
+    return token, str(expiry)
+
+# --- Image Functions ---
+def get_asset_cache():
+    """Process-wide image cache; GYAAN_ASSET_MODE picks static URLs (default), a companion server or data URIs."""
+    return default_cache()
+
+@timer.timed()
 def get_base64_image(image_path):
+    """Base64 of an image file, or "" if it is missing (encoded once per process)."""
+    return get_asset_cache().base64(image_path)
+
+@timer.timed()
+def get_image_src(image_path):
+    """<img src> for an image file: a content-hashed static URL, or "" if it is missing."""
+    return get_asset_cache().src(image_path)
+
+@timer.timed()
+def get_card_image_html(image_path):
+    """Card image markup: a <picture> of the 1x/2x WebP and JPEG thumbnails when
+    `python thumbnails.py build` has made them, else an <img> of the original."""
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    absolute_path = os.path.join(script_dir, image_path)
-    
-    if not os.path.isfile(absolute_path):
-        parent_dir = os.path.dirname(script_dir)
-        absolute_path = os.path.join(parent_dir, image_path)
-    
-    try:
-        with open(absolute_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
-        placeholder = ""
-        return placeholder
+    variants = thumbnails.lookup(image_path, root=script_dir)
+    if variants:
+        webp, jpg = (thumbnails.srcset(variants, extension, get_image_src) for extension in ('webp', 'jpg'))
+        return card_image_html(get_image_src(variants['1x.jpg']), jpg, [("image/webp", webp)])
+    name = image_path.split('/', 1)[1] if image_path.startswith('artifacts/') else image_path
+    return card_image_html(get_image_src(resolve_artifact(name) or image_path))
+
+# --- Login Admission Control ---
+@st.cache_resource
+def get_admission_controller():
+    """Process-wide rate limiter and concurrency cap for credential checks."""
+    return AdmissionController(client_rate=LOGIN_CLIENT_RATE / 60, client_burst=max(1, int(LOGIN_CLIENT_RATE)))
+
+def get_client_id():
+    """Address of the connecting client, used for rate limiting.
+
+    X-Forwarded-For is set by the client, so it is only read behind TRUSTED_PROXY_HOPS
+    proxies, taking the address the outermost of them appended.
+    """
+    if TRUSTED_PROXY_HOPS:
+        hops = [hop.strip() for hop in st.context.headers.get("X-Forwarded-For", "").split(",")]
+        if len(hops) >= TRUSTED_PROXY_HOPS and hops[-TRUSTED_PROXY_HOPS]:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return st.context.ip_address or "unknown"
 
 # --- Handle Login/Logout Logic ---
+def rerun(scope="app"):
+    """st.rerun, widened to the whole app when a fragment rerun is asked for during a full run."""
+    ctx = get_script_run_ctx()
+    if scope == "fragment" and not (ctx and ctx.fragment_ids_this_run):
+        scope = "app"
+    st.rerun(scope=scope)
+
+def count_fragment_rerun():
+    """Count a rerun of just the calling fragment (full runs are counted at the top of the script)."""
+    ctx = get_script_run_ctx()
+    if ctx and ctx.fragment_ids_this_run:
+        metrics.RERUNS.labels("fragment").inc()
+        metrics.SESSIONS.touch(ctx.session_id)
+
 def handle_logout():
     # Clear session state
     for key in ['user', 'token', 'ts', 'role']:
@@ -550,37 +720,44 @@ def handle_logout():
     st.session_state["show_forgot_password"] = False
     st.rerun()
 
-def handle_login_click():
+def handle_login_click(scope="app"):
     st.session_state["show_login"] = True
     st.session_state["show_signup"] = False
     st.session_state["show_forgot_password"] = False
-    st.rerun()
+    rerun(scope)
 
-def handle_signup_click():
+def handle_signup_click(scope="app"):
     st.session_state["show_signup"] = True
     st.session_state["show_login"] = False
     st.session_state["show_forgot_password"] = False
-    st.rerun()
+    rerun(scope)
 
-def handle_forgot_password_click():
+def handle_forgot_password_click(scope="app"):
     st.session_state["show_forgot_password"] = True
     st.session_state["show_login"] = False
     st.session_state["show_signup"] = False
-    st.rerun()
+    rerun(scope)
 
+@timer.timed()
 def handle_login_submit(username, password):
-    if authenticate_user(username, password):
-        token, ts = generate_user_token(username)
-        
+    admission = get_admission_controller()
+    rejection = admission.acquire(username, get_client_id())
+    if rejection:
+        metrics.LOGIN_ATTEMPTS.labels("rejected").inc()
+        st.error(rejection)
+        return
+    try:
+        authenticated = authenticate_user(username, password)
+    finally:
+        admission.release()
+    metrics.LOGIN_ATTEMPTS.labels("success" if authenticated else "failure").inc()
+    
+    if authenticated:
         # Get the actual username with correct case
-        users = load_users()
-        actual_username = None
-        for user in users.keys():
-            if user.lower() == username.lower():
-                actual_username = user
-                break
+        actual_username = get_user_store().get_username(username)
         
         user_info = get_user_info(actual_username)
+        token, ts = generate_user_token(actual_username, user_info.get('role', 'USER'))
         st.session_state['user'] = actual_username
         st.session_state['token'] = token
         st.session_state['ts'] = ts
@@ -593,6 +770,7 @@ def handle_login_submit(username, password):
     else:
         st.error("Invalid Creditinals or User Does not exist. Please click on singup if new user or click on Forgot password to rest your password.")
 
+@timer.timed()
 def handle_signup_submit(username, password, confirm_password, email):
     if password != confirm_password:
         st.error("Passwords do not match.")
@@ -608,10 +786,11 @@ def handle_signup_submit(username, password, confirm_password, email):
         st.info("You can now login with your credentials.")
         st.session_state["show_signup"] = False
         st.session_state["show_login"] = True
-        st.rerun()
+        rerun("fragment")
     else:
         st.error(message)
 
+@timer.timed()
 def handle_forgot_password_submit(username_or_email, new_password, confirm_password):
     """Handle forgot password with direct password reset."""
     if new_password != confirm_password:
@@ -622,24 +801,26 @@ def handle_forgot_password_submit(username_or_email, new_password, confirm_passw
         st.error("Password must be at least 6 characters long.")
         return False
     
-    users = load_users()
-    username = None
-    username_or_email_lower = username_or_email.lower()
-    
-    # Check if input is username or email (case insensitive)
-    for user, data in users.items():
-        if user.lower() == username_or_email_lower or data.get('email', '').lower() == username_or_email_lower:
-            username = user
-            break
-    
-    if not username:
-        st.error("Username or email not found.")
+    admission = get_admission_controller()
+    rejection = admission.acquire(username_or_email, get_client_id())
+    if rejection:
+        st.error(rejection)
         return False
+    try:
+        # Check if input is username or email (case insensitive)
+        store = get_user_store()
+        username = store.find(username_or_email)
+        
+        if not username:
+            st.error("Username or email not found.")
+            return False
+        
+        # Update password directly
+        updated = store.update(username, password=hash_password(new_password))
+    finally:
+        admission.release()
     
-    # Update password directly
-    users[username]['password'] = hash_password(new_password)
-    
-    if save_users(users):
+    if updated:
         st.success("Password reset successfully! You can now login with your new password.")
         return True
     else:
@@ -661,6 +842,8 @@ def handle_app_click(link):
         full_link = f"{link}{separator}user={username}&token={token}&ts={ts}"
         st.markdown(f'<meta http-equiv="refresh" content="0; url={full_link}">', unsafe_allow_html=True)
 
+timer.lap("definitions")
+
 # --- Sidebar ---
 with st.sidebar:
     # try:
@@ -676,6 +859,10 @@ with st.sidebar:
     username = st.session_state.get('user')
     if username:
         st.success(f"Logged in as: **{username}**")
+        if get_token_keys() is None:
+            st.error(TOKEN_KEYS_MISSING)
+        if st.session_state.get('role', '').upper() == 'ADMIN':
+            st.page_link("pages/performance.py", label="📈 Performance")
         
         # st.markdown("#### Quick Links")
         # # Use HTML buttons for smooth scroll
@@ -736,184 +923,270 @@ with st.sidebar:
     </script>
     """, unsafe_allow_html=True)
 
+timer.lap("sidebar")
+
 # --- Main App Layout ---
 
-# Top Bar with Login/User Info
-username = st.session_state.get('user', '')
-if username:
-    # User is logged in
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        st.markdown(f'<div class="user-info">👤 Welcome, {username}</div>', unsafe_allow_html=True)
-    with col2:
-        if st.button("Logout", key="logout_btn"):
-            handle_logout()
-else:
-    # User not logged in
-    col1, col2, col3 = st.columns([2, 1, 1])
-    with col1:
-        st.markdown('<div class="user-info">Welcome to Gyaan Apps</div>', unsafe_allow_html=True)
-    with col2:
-        if st.button("Login", key="login_btn"):
-            handle_login_click()
-    with col3:
-        if st.button("Sign Up", key="signup_btn"):
-            handle_signup_click()
+# The auth panel is a fragment: interacting with it reruns only the panel, not
+# the sidebar, CSS, cards, About, FAQ and footer. Logging in or out still
+# reruns the whole app since every section depends on the user.
+@st.fragment
+@timer.timed()
+def render_auth_panel():
+    count_fragment_rerun()
+    # Top Bar with Login/User Info
+    username = st.session_state.get('user', '')
+    if username:
+        # User is logged in
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f'<div class="user-info">👤 Welcome, {username}</div>', unsafe_allow_html=True)
+        with col2:
+            if st.button("Logout", key="logout_btn"):
+                handle_logout()
+    else:
+        # User not logged in
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            st.markdown('<div class="user-info">Welcome to Gyaan Apps</div>', unsafe_allow_html=True)
+        with col2:
+            if st.button("Login", key="login_btn"):
+                handle_login_click(scope="fragment")
+        with col3:
+            if st.button("Sign Up", key="signup_btn"):
+                handle_signup_click(scope="fragment")
+
+    show_form = not username and any(st.session_state.get(key, False) for key in
+                                     ("show_login", "show_signup", "show_forgot_password"))
+    if show_form:
+        # Hide the main content from inside the fragment so opening/closing a form needs no full rerun
+        st.markdown("<style>.st-key-main_content {display: none;}</style>", unsafe_allow_html=True)
+
+    # Show login form
+    if st.session_state.get("show_login", False) and not username:
+        st.markdown("<h2 style='text-align: center; margin-bottom: 20px;'>Login</h2>", unsafe_allow_html=True)
+
+        with st.form("login_form"):
+            login_username = st.text_input("Username")
+            login_password = st.text_input("Password", type="password")
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col2:
+                submit_login = st.form_submit_button("Login", use_container_width=True)
+
+            if submit_login:
+                if login_username and login_password:
+                    handle_login_submit(login_username, login_password)
+                else:
+                    st.error("Please enter both username and password.")
 
-# Show login form
-if st.session_state.get("show_login", False) and not username:
-    st.markdown("<h2 style='text-align: center; margin-bottom: 20px;'>Login</h2>", unsafe_allow_html=True)
-    
-    with st.form("login_form"):
-        login_username = st.text_input("Username")
-        login_password = st.text_input("Password", type="password")
         col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            if st.button("Cancel", key="cancel_login"):
+                st.session_state["show_login"] = False
+                rerun("fragment")
         with col2:
-            submit_login = st.form_submit_button("Login", use_container_width=True)
-        
-        if submit_login:
-            if login_username and login_password:
-                handle_login_submit(login_username, login_password)
-            else:
-                st.error("Please enter both username and password.")
-    
-    col1, col2, col3 = st.columns([1, 1, 1])
-    with col1:
-        if st.button("Cancel", key="cancel_login"):
-            st.session_state["show_login"] = False
-            st.rerun()
-    with col2:
-        if st.button("Sign Up", key="goto_signup"):
-            handle_signup_click()
-    with col3:
-        if st.button("Forgot Password?", key="goto_forgot"):
-            handle_forgot_password_click()
-
-# Show signup form
-elif st.session_state.get("show_signup", False) and not username:
-    st.markdown("<h2 style='text-align: center; margin-bottom: 20px;'>Sign Up</h2>", unsafe_allow_html=True)
-    
-    with st.form("signup_form"):
-        signup_username = st.text_input("Username")
-        signup_email = st.text_input("Email")
-        signup_password = st.text_input("Password", type="password")
-        signup_confirm_password = st.text_input("Confirm Password", type="password")
+            if st.button("Sign Up", key="goto_signup"):
+                handle_signup_click(scope="fragment")
+        with col3:
+            if st.button("Forgot Password?", key="goto_forgot"):
+                handle_forgot_password_click(scope="fragment")
+
+    # Show signup form
+    elif st.session_state.get("show_signup", False) and not username:
+        st.markdown("<h2 style='text-align: center; margin-bottom: 20px;'>Sign Up</h2>", unsafe_allow_html=True)
+
+        with st.form("signup_form"):
+            signup_username = st.text_input("Username")
+            signup_email = st.text_input("Email")
+            signup_password = st.text_input("Password", type="password")
+            signup_confirm_password = st.text_input("Confirm Password", type="password")
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col2:
+                submit_signup = st.form_submit_button("Sign Up", use_container_width=True)
+
+            if submit_signup:
+                if signup_username and signup_email and signup_password and signup_confirm_password:
+                    handle_signup_submit(signup_username, signup_password, signup_confirm_password, signup_email)
+                else:
+                    st.error("Please fill in all fields.")
+
         col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            if st.button("Cancel", key="cancel_signup"):
+                st.session_state["show_signup"] = False
+                rerun("fragment")
         with col2:
-            submit_signup = st.form_submit_button("Sign Up", use_container_width=True)
-        
-        if submit_signup:
-            if signup_username and signup_email and signup_password and signup_confirm_password:
-                handle_signup_submit(signup_username, signup_password, signup_confirm_password, signup_email)
-            else:
-                st.error("Please fill in all fields.")
-    
-    col1, col2, col3 = st.columns([1, 1, 1])
-    with col1:
-        if st.button("Cancel", key="cancel_signup"):
-            st.session_state["show_signup"] = False
-            st.rerun()
-    with col2:
-        if st.button("Login", key="goto_login"):
-            handle_login_click()
+            if st.button("Login", key="goto_login"):
+                handle_login_click(scope="fragment")
+
+    # Show forgot password form
+    elif st.session_state.get("show_forgot_password", False) and not username:
+        st.markdown("<h2 style='text-align: center; margin-bottom: 20px;'>Reset Password</h2>", unsafe_allow_html=True)
+
+        with st.form("forgot_password_form"):
+            username_or_email = st.text_input("Username or Email")
+            st.markdown("<br>", unsafe_allow_html=True)
+            new_password = st.text_input("New Password", type="password")
+            confirm_new_password = st.text_input("Confirm New Password", type="password")
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col2:
+                submit_reset = st.form_submit_button("Reset Password", use_container_width=True)
+
+            if submit_reset:
+                if username_or_email and new_password and confirm_new_password:
+                    if handle_forgot_password_submit(username_or_email, new_password, confirm_new_password):
+                        st.session_state["show_forgot_password"] = False
+                        st.session_state["show_login"] = True
+                        time.sleep(2)  # Small delay to show success message
+                        rerun("fragment")
+                else:
+                    st.error("Please fill in all fields.")
 
-# Show forgot password form
-elif st.session_state.get("show_forgot_password", False) and not username:
-    st.markdown("<h2 style='text-align: center; margin-bottom: 20px;'>Reset Password</h2>", unsafe_allow_html=True)
-    
-    with st.form("forgot_password_form"):
-        username_or_email = st.text_input("Username or Email")
-        st.markdown("<br>", unsafe_allow_html=True)
-        new_password = st.text_input("New Password", type="password")
-        confirm_new_password = st.text_input("Confirm New Password", type="password")
         col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            if st.button("Cancel", key="cancel_forgot"):
+                st.session_state["show_forgot_password"] = False
+                rerun("fragment")
         with col2:
-            submit_reset = st.form_submit_button("Reset Password", use_container_width=True)
-        
-        if submit_reset:
-            if username_or_email and new_password and confirm_new_password:
-                if handle_forgot_password_submit(username_or_email, new_password, confirm_new_password):
-                    st.session_state["show_forgot_password"] = False
-                    st.session_state["show_login"] = True
-                    time.sleep(2)  # Small delay to show success message
-                    st.rerun()
-            else:
-                st.error("Please fill in all fields.")
-    
-    col1, col2, col3 = st.columns([1, 1, 1])
-    with col1:
-        if st.button("Cancel", key="cancel_forgot"):
-            st.session_state["show_forgot_password"] = False
-            st.rerun()
-    with col2:
-        if st.button("Login", key="goto_login_from_forgot"):
-            handle_login_click()
-
-else:
-    # Show main app content
+            if st.button("Login", key="goto_login_from_forgot"):
+                handle_login_click(scope="fragment")
+
+@st.cache_resource
+def get_app_registry():
+    """Apps shown as cards, from APPS_FILE; edits are picked up without a restart."""
+    return AppRegistry(APPS_FILE, on_error=lambda e: st.error(f"Error loading app registry: {e}"))
+
+@st.cache_resource
+def get_health_prober():
+    """Background prober of every replica of the active apps; card badges read its cached results."""
+    registry = AppRegistry(APPS_FILE)  # Own instance: errors are logged, not shown from the prober thread
+    prober = HealthProber(lambda: [url for app in registry.snapshot()[0] if app.status == 'active'
+                                   for url in app.replicas],
+                          interval=HEALTH_PROBE_INTERVAL)
+    prober.start()
+    return prober
+
+@st.cache_resource
+def get_replica_selector():
+    """Sticky per-user choice of replica for apps listed with several URLs."""
+    return ReplicaSelector(get_health_prober(), sticky_ttl=SESSION_TOKEN_TTL)
+
+@st.cache_resource
+def get_card_grid_renderer():
+    return CardGridRenderer(get_card_image_html)
+
+@timer.timed()
+def render_card_grid():
+    """The whole grid as one element, built once per registry version and visitor role."""
+    apps, version = get_app_registry().snapshot()
+    username = st.session_state.get('user', '')
+    selector = get_replica_selector()
+    grid_html = get_card_grid_renderer().render(apps, version, username,
+                                                st.session_state.get('role'), st.session_state.get('token', ''),
+                                                st.session_state.get('ts', ''), health=get_health_prober().snapshot(),
+                                                pick=lambda app: selector.pick(app, username))
+    st.markdown(grid_html, unsafe_allow_html=True)
+
+@st.cache_resource
+def get_faq_index():
+    return FaqIndex()
+
+@st.fragment
+@timer.timed()
+def render_faq_section(faqs):
+    """Search box and one page of ranked FAQ entries, sent as a single HTML element.
+
+    Typing or paging reruns only this section, and only the visible page is rendered.
+    """
+    count_fragment_rerun()
+    index = get_faq_index()
+    index.update(faqs)
+    query = st.text_input("Search FAQs", key="faq_query", placeholder="Search FAQs", label_visibility="collapsed")
+    if st.session_state.get("faq_last_query") != query:
+        st.session_state["faq_last_query"] = query
+        st.session_state["faq_page"] = 0
+    page = st.session_state.get("faq_page", 0)
+    total, page_html = index.page_html(query, page, FAQ_PAGE_SIZE)
+    last_page = max(0, (total - 1) // FAQ_PAGE_SIZE)
+    if page > last_page:
+        # The FAQ file shrank under a session that was paging through it
+        page = st.session_state["faq_page"] = last_page
+        total, page_html = index.page_html(query, page, FAQ_PAGE_SIZE)
+    if not page_html:
+        st.info("No FAQs match your search." if query else "No FAQs available at the moment.")
+        return
+    st.markdown(f'<div class="faq-list">{page_html}</div>', unsafe_allow_html=True)
+    pages = math.ceil(total / FAQ_PAGE_SIZE)
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("‹ Previous", key="faq_prev", disabled=page == 0):
+                st.session_state["faq_page"] = page - 1
+                rerun("fragment")
+        with col2:
+            st.markdown(f"<p style='text-align: center;'>Page {page + 1} of {pages} ({total} FAQs)</p>",
+                        unsafe_allow_html=True)
+        with col3:
+            if st.button("Next ›", key="faq_next", disabled=page >= pages - 1):
+                st.session_state["faq_page"] = page + 1
+                rerun("fragment")
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus /metrics on METRICS_HOST:METRICS_PORT, including the components' own stats."""
+    if not METRICS_PORT:
+        return None
+    admission, journal, assets = get_admission_controller(), get_user_journal(), get_asset_cache()
+    prober, selector, renderer, faq_index = (get_health_prober(), get_replica_selector(),
+                                             get_card_grid_renderer(), get_faq_index())
+
+    def collect():
+        return [
+            metrics.from_stats("gyaan_login_admission_total", 'counter',
+                               "Credential checks admitted or rejected by the admission controller",
+                               "result", admission.counters),
+            metrics.family("gyaan_login_in_flight", 'gauge', "Credential checks running now",
+                           [("", {}, admission.in_flight)]),
+            metrics.family("gyaan_login_queued", 'gauge', "Credential checks waiting for a slot",
+                           [("", {}, admission.queued)]),
+            metrics.family("gyaan_users_bytes_total", 'counter', "Bytes of users snapshot and journal read or written",
+                           [("", {'op': 'read'}, journal.stats['bytes_read']),
+                            ("", {'op': 'written'}, journal.stats['bytes_written'])]),
+            metrics.from_stats("gyaan_users_journal_total", 'counter',
+                               "User journal full reloads, appended entries and group-commit batches", "event",
+                               {key: journal.stats[key] for key in ('reloads', 'appends', 'batches')}),
+            metrics.from_stats("gyaan_json_cache_requests_total", 'counter', "Parsed JSON file cache lookups",
+                               "result", json_cache.stats),
+            metrics.from_stats("gyaan_asset_cache_requests_total", 'counter', "Image asset cache lookups",
+                               "result", assets.stats),
+            metrics.from_stats("gyaan_card_grid_templates_total", 'counter',
+                               "Card grid template lookups served from cache (hits) or built", "result",
+                               renderer.stats),
+            metrics.from_stats("gyaan_faq_index_total", 'counter', "FAQ index updates, entries indexed and searches",
+                               "event", faq_index.stats),
+            metrics.from_stats("gyaan_health_probe_total", 'counter',
+                               "Health probes sent and connections opened or reused", "event", prober.stats),
+            metrics.from_stats("gyaan_replica_picks_total", 'counter',
+                               "Replica picks and how they were resolved", "event", selector.stats),
+            metrics.from_stats("gyaan_profiler_total", 'counter',
+                               "Rerun profiler arms, profiled and skipped reruns, saved and rotated files", "event",
+                               profiler.stats),
+        ]
+
+    metrics.REGISTRY.collector(collect)
+    return metrics.start_metrics_server(metrics.REGISTRY, METRICS_PORT, METRICS_HOST)
+
+get_metrics_server()
+render_auth_panel()
+timer.lap("auth_panel")
+
+# Show main app content (hidden by the auth panel while a form is open)
+with st.container(key="main_content"):
     # st.markdown('<div class="announcement">🔔 Latest updates and announcements will appear here</div>', unsafe_allow_html=True)
     st.markdown("<h1 id='app-cards-section' style='text-align: center;'>Gyaan Apps</h1>", unsafe_allow_html=True)
 
     # App Cards
-    cards = [
-        {"name": "GYAAN CODER<br><span style='font-size:0.85em'>Gyaan Coder provides real-time answers and code solutions for user queries across any programming language.</span>", "img": "artifacts/coder.jpg", "link": "http://10.21.4.25:8502"},
-        {"name": "GYAAN DOC<br><span style='font-size:0.85em'>Gyaan Doc is an AI-powered app that lets you upload documents, get instant summaries, and ask questions based on their content.</span>", "img": "artifacts/doc.jpg", "link": "http://10.21.4.25:8503"},
-        {"name": "GYAAN MEETING<br><span style='font-size:0.85em'>Gyaan Meeting converts meeting audio into text, provides transcripts, and lets you query information directly from the conversation.</span>", "img": "artifacts/meeting.jpg", "link": "http://10.21.4.25:8504"},
-        {"name": "GYAAN ADMIN<br><span style='font-size:0.85em'>Gyaan Admin is a chatbot to streamline admin tasks and answer queries on operations, policies, and processes.</span>", "img": "artifacts/admin.png", "link": "http://10.21.4.25:8505"},
-        # {"name": "GYAAN JITSI<br><span style='font-size:0.85em'>Gyaan Jitsi is an ai enabled meeting platform with meeting recording functionalities.Please upload recorded jitsi meetings to Gyaan Meeting</span>", "img": "artifacts/jitsi.png", "link": "https://gyaanjitsi.ursc.dos.gov.in/"},
-        {"name": "ELSIS<br><span style='font-size:0.85em'>ELSIS is a patented AI software designed to detect minute cracks in solar cells with unprecedented precision.</span>", "img": "artifacts/Gyaan_logo.jpeg", "link": "#"},
-        {"name": "Medical AI Doctor in Space<br><span style='font-size:0.85em'>MAIDS is a comprehensive medical assistant for astronauts, capable of diagnosing conditions and providing medicine recommendations with precise dosages using pharmacopoeia data</span>", "img": "artifacts/Gyaan_logo.jpeg", "link": "#"},
-        {"name": "Integrated Spacecraft Health Monitoring<br><span style='font-size:0.85em'> </span>", "img": "artifacts/Gyaan_logo.jpeg", "link": "#"},
-    ]
-
-    cols = st.columns(3)
-    
-    for i, card in enumerate(cards):
-        with cols[i % 3]:
-            img_base64 = get_base64_image(card['img'])
-            
-            # Display card content
-            card_html = f'''
-            <div class="stCard">
-                <img src="data:image/jpeg;base64,{img_base64}" class="card-image">
-                <p class="card-title">{card["name"]}</p>
-            </div>
-            '''
-            st.markdown(card_html, unsafe_allow_html=True)
-            
-            # Add button or link below card for clicking
-            if card['name'].startswith('ELSIS') or card['name'].startswith('Medical AI Doctor in Space'):
-                if st.button("Coming Soon", key=f"card_btn_{i}", 
-                            help=f"{card['name'].split('<')[0]} - Coming Soon",
-                            use_container_width=True,
-                            disabled=False):
-                    st.info("This app is coming soon!")
-                    pass  # Do nothing for coming soon apps
-            else:
-                # Build the full link with query params if logged in
-                username = st.session_state.get('user', '')
-                token = st.session_state.get('token', '')
-                ts = st.session_state.get('ts', '')
-                link = card['link']
-                if link.startswith("http"):
-                    if username:
-                        separator = "&" if "?" in link else "?"
-                        full_link = f"{link}{separator}user={username}&token={token}&ts={ts}"
-                        # Use HTML anchor styled as a button to open in new tab
-                        button_html = f'''<a href="{full_link}" target="_blank" rel="noopener noreferrer" style="display:block;text-align:center;background:#3B82F6;color:white;padding:10px 0;border-radius:6px;text-decoration:none;font-weight:500;margin-top:8px;">Open {card['name'].split('<')[0]}</a>'''
-                        st.markdown(button_html, unsafe_allow_html=True)
-                    else:
-                        # If not logged in, show a button that takes user to login page
-                        if st.button(f"Open {card['name'].split('<')[0]}", key=f"card_btn_{i}_login_redirect", help="Login required to access this app", use_container_width=True):
-                            st.session_state["show_login"] = True
-                            st.session_state["show_signup"] = False
-                            st.session_state["show_forgot_password"] = False
-                            st.rerun()
-                else:
-                    if st.button(f"Open {card['name'].split('<')[0]}", key=f"card_btn_{i}", 
-                                help=f"Click to open {card['name'].split('<')[0]}",
-                                use_container_width=True):
-                        st.info("This app is coming soon!")
+    render_card_grid()
 
     # About Gyaan Section
     st.markdown("---")
@@ -938,27 +1211,25 @@ else:
     st.markdown("---")
     st.markdown("<h2 id='faq-section' style='text-align: center; margin-top: 40px; color: #374151;'>Frequently Asked Questions</h2>", unsafe_allow_html=True)
     
-    faqs = faq_data.get('faqs', [])
-    
-    if faqs:
-        for i, faq in enumerate(faqs):
-            with st.expander(faq['question'], expanded=False):
-                st.write(faq['answer'])
-    else:
-        st.info("No FAQs available at the moment.")
+    render_faq_section(faq_data.get('faqs', []))
+
+timer.lap("main_content")
 
 # Footer
-isro_logo_base64 = get_base64_image("artifacts/isro.jpg")
-ursc_logo_base64 = get_base64_image("artifacts/ursc.jpg")
+isro_logo_src = get_image_src("artifacts/isro.jpg")
+ursc_logo_src = get_image_src("artifacts/ursc.jpg")
 
 footer_html = f"""
 <div class="footer">
-    <img src="data:image/jpeg;base64,{isro_logo_base64}" alt="ISRO Logo" style="height: 35px; margin-right: 10px;">
+    <img src="{isro_logo_src}" alt="ISRO Logo" style="height: 35px; margin-right: 10px;">
     <div class="footer-text">🚀 Built by Team GYAAN</div>
-    <img src="data:image/jpeg;base64,{ursc_logo_base64}" alt="UESC Logo" style="height: 35px; margin-left: 10px;">
+    <img src="{ursc_logo_src}" alt="UESC Logo" style="height: 35px; margin-left: 10px;">
 </div>
 """
 st.markdown(footer_html, unsafe_allow_html=True)
+timer.lap("footer")
+profiler.stop(profile)
+timer.end_run()
 
 
 # import streamlit as st
@@ -0,0 +1,139 @@
+"""In-memory full-text index over the FAQ entries, ranked with BM25.
+
+Questions and answers are tokenized into lowercase words; a word in the
+question counts ``QUESTION_WEIGHT`` times, so an entry asking about the
+searched words ranks above one that merely mentions them. ``update`` is
+called on every rerun with the list from load_faq_data; since json_cache hands
+back the same object until faq_data.json changes on disk, it normally returns
+at once. After a change only the entries that were added, edited or removed
+are re-indexed. A search (``page_html``) only scores the entries containing a
+query word and returns one page of results as ready-made ``<details>`` markup,
+each entry's HTML built once when it is indexed.
+"""
+import heapq
+import html
+import math
+import re
+import threading
+
+QUESTION_WEIGHT = 2
+K1 = 1.2
+B = 0.75
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def entry_html(faq):
+    """One FAQ entry as a collapsed ``<details>`` element for ``st.markdown``.
+
+    The answer is left as markdown, like ``st.write`` showed it: the blank
+    lines around it end the HTML blocks, so the markdown renderer formats it.
+    Its ``<`` are escaped so it cannot open tags of its own.
+    """
+    answer = faq.get('answer', '').strip().replace("<", "&lt;")
+    return (f'<details class="faq-item"><summary>{html.escape(faq.get("question", ""))}</summary>'
+            f'<div class="faq-answer">\n\n{answer}\n\n</div></details>')
+
+
+def _entry_key(faq):
+    return faq.get('question', ''), faq.get('answer', '')
+
+
+class FaqIndex:
+    """Inverted index of FAQ entries; ``page_html`` returns ``(total matches, HTML of the page)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source = None
+        self._postings = {}  # word -> {doc id: weighted term frequency}
+        self._lengths = {}  # doc id -> weighted length
+        self._total_length = 0
+        self._docs = {}  # (question, answer) -> doc id
+        self._entries = {}  # doc id -> faq entry
+        self._html = {}  # doc id -> entry_html of it
+        self._order = []  # doc ids in file order
+        self._next_id = 0
+        self.stats = {'updates': 0, 'indexed': 0, 'removed': 0, 'searches': 0}
+
+    def __len__(self):
+        return len(self._order)
+
+    def update(self, faqs):
+        """Bring the index in line with ``faqs``; a no-op when it is the list indexed last."""
+        if faqs is self._source:
+            return
+        with self._lock:
+            if faqs is self._source:
+                return
+            wanted = {}
+            for faq in faqs:
+                wanted.setdefault(_entry_key(faq), faq)
+            for key in [key for key in self._docs if key not in wanted]:
+                self._remove(self._docs.pop(key))
+            for key, faq in wanted.items():
+                if key not in self._docs:
+                    self._docs[key] = self._add(faq)
+                else:
+                    self._entries[self._docs[key]] = faq  # Same text, so its HTML is unchanged
+            self._order = list(dict.fromkeys(self._docs[_entry_key(faq)] for faq in faqs))
+            self._source = faqs
+            self.stats['updates'] += 1
+
+    def _add(self, faq):
+        doc_id = self._next_id
+        self._next_id += 1
+        frequencies = {}
+        for word in tokenize(faq.get('question', '')):
+            frequencies[word] = frequencies.get(word, 0) + QUESTION_WEIGHT
+        for word in tokenize(faq.get('answer', '')):
+            frequencies[word] = frequencies.get(word, 0) + 1
+        for word, frequency in frequencies.items():
+            self._postings.setdefault(word, {})[doc_id] = frequency
+        length = sum(frequencies.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        self._entries[doc_id] = faq
+        self._html[doc_id] = entry_html(faq)
+        self.stats['indexed'] += 1
+        return doc_id
+
+    def _remove(self, doc_id):
+        faq = self._entries.pop(doc_id)
+        del self._html[doc_id]
+        for word in set(tokenize(faq.get('question', '')) + tokenize(faq.get('answer', ''))):
+            postings = self._postings[word]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[word]
+        self._total_length -= self._lengths.pop(doc_id)
+        self.stats['removed'] += 1
+
+    def page_html(self, query, page=0, page_size=10):
+        """One page of the entries matching any word of ``query``, best first, as one string of
+        ``<details>`` elements; all entries in file order for an empty query."""
+        with self._lock:
+            total, doc_ids = self._search(query, page, page_size)
+            return total, "".join(self._html[doc_id] for doc_id in doc_ids)
+
+    def _search(self, query, page, page_size):
+        words = list(dict.fromkeys(tokenize(query)))
+        start = page * page_size
+        self.stats['searches'] += 1
+        if not words:
+            return len(self._order), self._order[start:start + page_size]
+        count = len(self._lengths)
+        average_length = self._total_length / count if count else 0
+        scores = {}
+        for word in words:
+            postings = self._postings.get(word)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = K1 * (1 - B + B * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+        top = heapq.nlargest(start + page_size, scores.items(), key=lambda item: (item[1], -item[0]))
+        return len(scores), [doc_id for doc_id, _ in top[start:]]
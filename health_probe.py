@@ -0,0 +1,245 @@
+"""Background health checks for the downstream Gyaan apps, feeding the card status badges.
+
+A daemon thread runs an asyncio loop that probes every target URL
+concurrently with a plain HTTP/1.1 GET of ``health_path`` (Streamlit apps
+answer /_stcore/health), keeping one keep-alive connection per host. Each
+probe has a timeout; a failing target is retried with exponential backoff
+instead of every ``interval``. Results go into a TTL cache that page renders
+read without ever touching the network:
+
+- up: answered below ``degraded_latency`` seconds
+- degraded: answered slowly, or with a 5xx
+- down: refused, timed out or broke the connection
+
+Each result also carries exponentially weighted averages of the latency and
+of the error rate (a 5xx or ``down`` counts as an error), which the replica
+selector uses. A result older than ``ttl`` is dropped, so a stuck prober
+shows no badge rather than a stale one. ``version`` changes whenever any
+state does, which lets the card grid keep caching its HTML.
+"""
+import asyncio
+import logging
+import ssl
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+Health = namedtuple('Health', 'state latency status_code checked_at failures latency_ewma error_rate')
+
+
+class ProbeError(Exception):
+    pass
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection to a host."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+    async def get(self, host_header, path):
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: gyaan-health-probe\r\n"
+                          f"Connection: keep-alive\r\n\r\n".encode())
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ProbeError("connection closed")
+        try:
+            status_code = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise ProbeError(f"bad status line {status_line[:40]!r}")
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()  # Body runs until the server closes
+            headers['connection'] = 'close'
+        return status_code, headers.get('connection', '').lower() != 'close'
+
+
+class HealthProber:
+    """Probe ``targets()`` (a callable returning URLs) in the background; read results with ``get``.
+
+    ``stats`` counts probes, connections opened and connections reused.
+    """
+
+    def __init__(self, targets, interval=15.0, timeout=3.0, ttl=60.0, degraded_latency=1.0,
+                 max_backoff=300.0, health_path="/_stcore/health", ewma_alpha=0.3, clock=time.monotonic):
+        self.targets = targets
+        self.interval = interval
+        self.timeout = timeout
+        self.ttl = ttl
+        self.degraded_latency = degraded_latency
+        self.max_backoff = max_backoff
+        self.health_path = health_path
+        self.ewma_alpha = ewma_alpha
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._results = {}
+        self._next_probe = {}
+        self._next_expiry = float('inf')
+        self._connections = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self.version = 0
+        self._snapshot = (None, {})
+        self.stats = {'probes': 0, 'connections_opened': 0, 'connections_reused': 0}
+
+    # --- Reading results (any thread) ---
+
+    def _expire(self):
+        now = self._clock()
+        if now < self._next_expiry:
+            return
+        with self._lock:
+            expired = [url for url, health in self._results.items() if now - health.checked_at > self.ttl]
+            for url in expired:
+                del self._results[url]
+            if expired:
+                self.version += 1
+            self._next_expiry = min((health.checked_at + self.ttl for health in self._results.values()),
+                                    default=float('inf'))
+
+    def get(self, url):
+        """Latest ``Health`` for ``url``, or None if it has no fresh result."""
+        self._expire()
+        return self._results.get(url)
+
+    def snapshot(self):
+        """Return ``(version, {url: state})`` for the fresh results; rebuilt only when a state changed."""
+        self._expire()
+        snapshot = self._snapshot
+        if snapshot[0] != self.version:
+            with self._lock:
+                snapshot = self._snapshot = (self.version, {url: health.state for url, health in self._results.items()})
+        return snapshot
+
+    def _record(self, url, state, latency, status_code):
+        now = self._clock()
+        failed = state == 'down' or (status_code or 0) >= 500
+        with self._lock:
+            previous = self._results.get(url)
+            failures = 0 if state != 'down' else (previous.failures + 1 if previous else 1)
+            if previous is None:
+                latency_ewma, error_rate = latency, float(failed)
+            else:
+                latency_ewma = previous.latency_ewma
+                if latency is not None:
+                    latency_ewma = latency if latency_ewma is None else (
+                        latency_ewma + self.ewma_alpha * (latency - latency_ewma))
+                error_rate = previous.error_rate + self.ewma_alpha * (failed - previous.error_rate)
+            self._results[url] = Health(state, latency, status_code, now, failures, latency_ewma, error_rate)
+            if previous is None or previous.state != state:
+                self.version += 1
+            self._next_expiry = min(self._next_expiry, now + self.ttl)
+        backoff = self.interval if not failures else min(self.interval * 2 ** failures, self.max_backoff)
+        self._next_probe[url] = now + backoff
+
+    # --- Probing (prober thread) ---
+
+    async def _connection(self, scheme, host, port):
+        key = (scheme, host, port)
+        connection = self._connections.pop(key, None)
+        if connection is not None:
+            self.stats['connections_reused'] += 1
+            return key, connection, True
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=ssl.create_default_context() if scheme == 'https' else None)
+        self.stats['connections_opened'] += 1
+        return key, _Connection(reader, writer), False
+
+    async def _get(self, url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        host_header = parts.netloc
+        for _attempt in range(2):
+            key, connection, reused = await self._connection(parts.scheme, parts.hostname, port)
+            try:
+                status_code, keep_alive = await connection.get(host_header, self.health_path)
+            except (OSError, EOFError, asyncio.IncompleteReadError, ProbeError):
+                connection.close()
+                if reused:
+                    continue  # The server dropped the idle connection; retry on a fresh one
+                raise
+            except BaseException:  # Timed out (cancelled) mid-request: the connection is unusable
+                connection.close()
+                raise
+            if keep_alive:
+                self._connections[key] = connection
+            else:
+                connection.close()
+            return status_code
+        raise ProbeError("connection closed")
+
+    async def probe(self, url):
+        """Probe ``url`` once and record the result."""
+        self.stats['probes'] += 1
+        start = self._clock()
+        try:
+            status_code = await asyncio.wait_for(self._get(url), self.timeout)
+        except (OSError, EOFError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProbeError, ValueError):
+            self._record(url, 'down', None, None)
+            return
+        latency = self._clock() - start
+        state = 'degraded' if status_code >= 500 or latency > self.degraded_latency else 'up'
+        self._record(url, state, latency, status_code)
+
+    def _due(self):
+        try:
+            urls = list(dict.fromkeys(self.targets()))
+        except Exception:
+            logger.exception("Could not list health probe targets")
+            return []
+        now = self._clock()
+        return [url for url in urls if self._next_probe.get(url, 0) <= now]
+
+    async def probe_due(self):
+        """Probe every target whose next check is due, concurrently, and wait for all of them."""
+        due = self._due()
+        if due:
+            await asyncio.gather(*(self.probe(url) for url in due))
+
+    async def _run(self):
+        # Each probe is its own task so a slow or hanging target never delays the others
+        in_flight = {}
+        while not self._stop.is_set():
+            for url in self._due():
+                if url not in in_flight:
+                    in_flight[url] = asyncio.create_task(self.probe(url))
+                    in_flight[url].add_done_callback(lambda _task, url=url: in_flight.pop(url, None))
+            await asyncio.sleep(min(0.5, self.interval))
+        if in_flight:
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def start(self):
+        """Start probing in a daemon thread; returns the thread."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="health-prober", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,64 @@
+"""Process-wide cache of parsed JSON files, validated against the file's mtime and size.
+
+Streamlit reruns the whole script on every interaction; going through this
+cache means a data file is only parsed again after it changed on disk.
+Returned objects are shared between sessions, so callers must treat them as
+read-only and hand a new object to ``store`` when they write.
+"""
+import json
+import os
+import threading
+
+_lock = threading.Lock()
+_entries = {}
+stats = {'hits': 0, 'misses': 0}
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load(path, default=None):
+    """Return the parsed contents of ``path``, or ``default`` if it does not exist.
+
+    Parse errors propagate to the caller and nothing is cached for them.
+    """
+    key = os.path.abspath(path)
+    signature = _signature(key)
+    entry = _entries.get(key)
+    if entry is not None and entry[0] == signature:
+        stats['hits'] += 1
+        return entry[1]
+
+    stats['misses'] += 1
+    if signature is None:
+        data = default
+    else:
+        with open(key, 'r') as f:
+            data = json.load(f)
+        # Re-stat so a write that raced with the read is picked up next time
+        if _signature(key) != signature:
+            return data
+    with _lock:
+        _entries[key] = (signature, data)
+    return data
+
+
+def store(path, data):
+    """Record ``data`` as the current contents of ``path`` after the caller wrote it."""
+    key = os.path.abspath(path)
+    with _lock:
+        _entries[key] = (_signature(key), data)
+
+
+def invalidate(path=None):
+    """Drop the cached entry for ``path``, or every entry when no path is given."""
+    with _lock:
+        if path is None:
+            _entries.clear()
+        else:
+            _entries.pop(os.path.abspath(path), None)
@@ -0,0 +1,348 @@
+"""Counters and histograms for the portal, served in the Prometheus text format.
+
+Updating a metric takes no lock: every thread adds to its own cells, and a
+scrape sums the cells of all threads. When a thread exits, its cells are folded
+into the metric's totals. Streamlit starts a new thread for each script run,
+so the set of live cells stays small. Numbers that components already count
+in their ``stats`` are not duplicated. A collector reads them at scrape time
+(``Registry.collector``).
+
+    start_metrics_server(REGISTRY, 9464)   # GET http://127.0.0.1:9464/metrics
+"""
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Cells:
+    """One thread's cells of a series; handed back to the series when the thread ends."""
+
+    __slots__ = ('series', 'values')
+
+    def __init__(self, series, size):
+        self.series = series
+        self.values = [0] * size
+
+    def __del__(self):
+        self.series._retire(self)
+
+
+class _Series:
+    """Values of one label combination, kept in per-thread cells."""
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Taken when a thread starts or ends, and on scrape
+        self._live = {}
+        self._retired = [0] * size
+
+    def _values(self):
+        try:
+            return self._local.cells.values
+        except AttributeError:
+            cells = _Cells(self, self._size)
+            with self._lock:
+                self._live[id(cells)] = cells.values
+            self._local.cells = cells
+            return cells.values
+
+    def _retire(self, cells):
+        with self._lock:
+            self._live.pop(id(cells), None)
+            for index, value in enumerate(cells.values):
+                self._retired[index] += value
+
+    def totals(self):
+        with self._lock:
+            totals = list(self._retired)
+            for values in self._live.values():
+                for index, value in enumerate(values):
+                    totals[index] += value
+        return totals
+
+
+class _CounterSeries(_Series):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self._values()[0] += amount
+
+
+class _HistogramSeries(_Series):
+    def __init__(self, buckets):
+        super().__init__(len(buckets) + 2)  # One cell per bucket, one for +Inf, and the sum
+        self.buckets = buckets
+
+    def observe(self, value):
+        values = self._values()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def time(self):
+        """Context manager observing the seconds spent in its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('series', 'start')
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.series.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values, **labels):
+        """The series for these label values, created on first use."""
+        key = values or tuple(labels[name] for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """``(suffix, labels, value)`` for every series."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def samples(self):
+        for key, series in list(self._series.items()):
+            yield "", dict(zip(self.labelnames, key)), series.totals()[0]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def samples(self):
+        for key, series in list(self._series.items()):
+            labels = dict(zip(self.labelnames, key))
+            totals = series.totals()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), totals[:-1]):
+                cumulative += count
+                yield "_bucket", {**labels, 'le': _format_value(float(bound))}, cumulative
+            yield "_sum", labels, totals[-1]
+            yield "_count", labels, cumulative
+
+
+def family(name, kind, help, samples):
+    """A collected metric family: ``samples`` is an iterable of ``(suffix, labels, value)``."""
+    return name, kind, help, samples
+
+
+def from_stats(name, kind, help, label, stats):
+    """Family with one sample per key of a component's ``stats`` dict, the key as ``label``."""
+    return family(name, kind, help, [("", {label: key}, value) for key, value in list(stats.items())])
+
+
+class Registry:
+    """Metrics and collectors rendered together by ``render``."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """Add ``collect()``, called on every scrape, returning families (see ``family``)."""
+        with self._lock:
+            self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        families = [(metric.name, metric.kind, metric.help, metric.samples()) for metric in self._metrics]
+        for collect in list(self._collectors):
+            families.extend(collect())
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class SessionTracker:
+    """Reruns per Streamlit session; sessions idle for ``idle_timeout`` seconds no longer count as active.
+
+    ``touch`` runs on the session's own script thread, so it needs no lock.
+    Idle sessions are dropped by ``collect`` and, at most every
+    ``prune_interval`` seconds, by ``touch``, so the dict stays bounded
+    without a scraper.
+    """
+
+    def __init__(self, idle_timeout=1800.0, prune_interval=60.0, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.prune_interval = prune_interval
+        self._clock = clock
+        self._sessions = {}  # session id -> [reruns, last seen]
+        self._pruned_at = clock()
+
+    def touch(self, session_id):
+        now = self._clock()
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            self._sessions[session_id] = [1, now]
+        else:
+            entry[0] += 1
+            entry[1] = now
+        if now - self._pruned_at > self.prune_interval:
+            self._prune(now)
+
+    def _prune(self, now):
+        """Drop idle sessions; returns the rerun counts of the active ones."""
+        self._pruned_at = now
+        active = []
+        for session_id, (reruns, last_seen) in list(self._sessions.items()):
+            if now - last_seen > self.idle_timeout:
+                self._sessions.pop(session_id, None)
+            else:
+                active.append(reruns)
+        return active
+
+    def collect(self):
+        active = self._prune(self._clock())
+        active.sort()
+        quantiles = [("", {'quantile': str(q)}, active[min(len(active) - 1, int(q * len(active)))])
+                     for q in (0.5, 0.9, 0.99)] if active else []
+        return [
+            family("gyaan_active_sessions", 'gauge', "Sessions that reran within the idle timeout",
+                   [("", {}, len(active))]),
+            family("gyaan_session_reruns", 'summary', "Reruns so far per active session",
+                   quantiles + [("_sum", {}, sum(active)), ("_count", {}, len(active))]),
+        ]
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(registry, port, host='127.0.0.1', tries=8):
+    """Serve ``registry`` at /metrics in a daemon thread.
+
+    Each worker process has its own registry, so when ``port`` is taken by
+    another worker on this host the next ``tries - 1`` ports are tried in
+    turn; scrape that range. Returns the server, or None (with a warning
+    logged) when all of them are taken.
+    """
+    handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'registry': registry})
+    for candidate in range(port, port + tries):
+        try:
+            server = ThreadingHTTPServer((host, candidate), handler)
+            break
+        except OSError:
+            continue
+    else:
+        logger.warning("Metrics not served: ports %d-%d on %s are all taken", port, port + tries - 1, host)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics at http://%s:%d/metrics", host, candidate)
+    return server
+
+
+# --- Portal metrics ---
+REGISTRY = Registry()
+LOGIN_ATTEMPTS = REGISTRY.counter("gyaan_login_attempts_total", "Login form submissions by outcome",
+                                  ("outcome",))
+PASSWORD_SECONDS = REGISTRY.histogram("gyaan_password_seconds",
+                                      "Password hash and verify latency, including the wait for a KDF worker",
+                                      ("op",))
+USERS_LOAD_SECONDS = REGISTRY.histogram("gyaan_users_load_seconds", "Time to load the users mapping")
+USERS_SAVE_SECONDS = REGISTRY.histogram("gyaan_users_save_seconds",
+                                        "Time to durably append one user change, including group-commit wait")
+RERUNS = REGISTRY.counter("gyaan_reruns_total", "Script runs by kind (full or fragment)", ("kind",))
+SESSIONS = SessionTracker()
+REGISTRY.collector(SESSIONS.collect)
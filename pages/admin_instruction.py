@@ -1,6 +1,7 @@
 import streamlit as st
 import os
-from PIL import Image
+import artifact_store
+from assets import figure_html
 
 def main():
     display_gyaan_admin()
@@ -23,12 +24,14 @@ def display_gyaan_admin():
     images_path = os.path.join(project_root, "artifacts", "admin")
     abs_images_path = os.path.abspath(images_path)
 
-    if not os.path.exists(images_path):
+    image_names = artifact_store.listdir("admin")
+
+    if not image_names:
         st.warning(f"Admin instruction images directory not found at: {abs_images_path}")
         st.info("Please create the directory and add instruction images (png, jpg, jpeg, gif) to it.")
         return
 
-    image_files = [f for f in os.listdir(images_path)
+    image_files = [f for f in image_names
                    if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
 
     if not image_files:
@@ -40,10 +43,9 @@ def display_gyaan_admin():
     # Display images with checks for their existence
     if len(image_files) > 1:
         try:
-            img_path = os.path.join(images_path, image_files[1])
-            image = Image.open(img_path)
+            img_path = artifact_store.resolve(f"admin/{image_files[1]}")
             st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
-            st.image(image, use_column_width=True)  
+            st.markdown(figure_html(img_path), unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
             st.markdown("<h3 style='text-align: center;'>To open Gyaan Admin click on button 'Open Gyaan Admin' on the home page.</h3>", unsafe_allow_html=True)
         except Exception as e:
@@ -51,10 +53,9 @@ def display_gyaan_admin():
 
     if len(image_files) > 0:
         try:
-            img_path = os.path.join(images_path, image_files[0])
-            image = Image.open(img_path)
+            img_path = artifact_store.resolve(f"admin/{image_files[0]}")
             st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
-            st.image(image, use_column_width=True)
+            st.markdown(figure_html(img_path), unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
             st.markdown("<h3 style='text-align: center;'>Input your query in the designated search field and submit to receive appropriate response for your administrative queries.</h3>", unsafe_allow_html=True)
         except Exception as e:
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
-from PIL import Image
+import artifact_store
+from assets import figure_html
 
 def main():
     display_doc_instructions()
@@ -21,15 +22,14 @@ def display_doc_instructions():
     images_path = os.path.join(project_root, "artifacts", "doc")
 
     def show_image(image_name, caption):
-        img_path = os.path.join(images_path, image_name)
-        if os.path.exists(img_path):
-            image = Image.open(img_path)
+        img_path = artifact_store.resolve(f"doc/{image_name}")
+        if img_path:
             st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
-            st.image(image, use_column_width=True)
+            st.markdown(figure_html(img_path), unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
             st.markdown(f"<h4 style='text-align: center;'>{caption}</h4>", unsafe_allow_html=True)
         else:
-            st.warning(f"Image not found: {img_path}")
+            st.warning(f"Image not found: {os.path.join(images_path, image_name)}")
 
     # Step 1: Open Gyaan Doc (show homescreen.png)
     show_image(
@@ -1,5 +1,6 @@
 import streamlit as st
-from PIL import Image
+import artifact_store
+from assets import figure_html
 
 st.markdown("""
 <style>
@@ -30,7 +31,7 @@ Welcome to Gyaan Apps! Please follow the instructions below for Signup, Login, a
 
 # --- Steps to Sign Up ---
 try:
-    st.image(r"artifacts/login and signup/signup.PNG", caption="Sign Up Screen", use_column_width=True)
+    st.markdown(figure_html(artifact_store.resolve("login and signup/signup.PNG"), caption="Sign Up Screen"), unsafe_allow_html=True)
 except Exception:
     st.warning("Sign Up screenshot (signup.PNG) not found.")
 
@@ -46,7 +47,7 @@ st.markdown("""
 
 # --- Steps to Login ---
 try:
-    st.image(r"artifacts/login and signup/login.PNG", caption="Login Screen", use_column_width=True)
+    st.markdown(figure_html(artifact_store.resolve("login and signup/login.PNG"), caption="Login Screen"), unsafe_allow_html=True)
 except Exception:
     st.info("Please save your login screenshot as 'login.PNG' in the folder: D:/smash/artifacts/login and signup/")
 
@@ -66,7 +67,7 @@ st.markdown("""
 
 # --- Steps to Reset Password ---
 try:
-    st.image(r"artifacts/login and signup/forgot_password.PNG", caption="Reset Password Screen", use_column_width=True)
+    st.markdown(figure_html(artifact_store.resolve("login and signup/forgot_password.PNG"), caption="Reset Password Screen"), unsafe_allow_html=True)
 except Exception:
     st.warning("Reset Password screenshot (forgot password.PNG) not found.")
 
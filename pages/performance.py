@@ -0,0 +1,98 @@
+import os
+import streamlit as st
+from perf_timing import SCRIPT, default_timer
+from profiler import default_profiler, top_functions
+
+def main():
+    display_performance()
+
+def display_performance():
+    st.markdown("""
+    <style>
+    [data-testid="stSidebar"] {display: none !important;}
+    /* Hide default Streamlit sidebar navigation */
+    div[data-testid="stSidebarNav"] {
+        display: none;
+    }
+    /* Hide sidebar collapse/expand button and its parent container */
+    button[data-testid="stBaseButton-headerNoPadding"] {display: none !important;}
+    div.st-emotion-cache-1y9tyez.eczjsme4 {display: none !important;}
+    </style>
+    """, unsafe_allow_html=True)
+
+    st.markdown("<h1 style='text-align: center;'>Gyaan Portal Performance</h1>", unsafe_allow_html=True)
+    st.page_link("centralized_app.py", label="🏠 Back to the portal")
+
+    if st.session_state.get('role', '').upper() != 'ADMIN':
+        st.error("This page is only available to administrators. Please log in with an admin account.")
+        return
+
+    display_timings(default_timer())
+    display_profiles(default_profiler())
+
+def display_timings(timer):
+    if not timer.enabled:
+        st.info("Section timing is disabled. Unset GYAAN_PERF_TIMING or set it to 1 and restart the portal.")
+        return
+
+    summary = timer.summary()
+    if not summary:
+        st.info("No timings recorded yet. Open the home page to collect some.")
+        return
+
+    script = summary.get(SCRIPT)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Full reruns", script['count'] if script else 0)
+    col2.metric("Script p50", f"{script['p50_ms']:.1f} ms" if script else "-")
+    col3.metric("Script p95", f"{script['p95_ms']:.1f} ms" if script else "-")
+    col4.metric("Script p99", f"{script['p99_ms']:.1f} ms" if script else "-")
+
+    st.markdown("### Sections and functions")
+    st.caption("Latest samples only (bounded ring buffer); fragment reruns count under their function name.")
+    rows = [{'section': name, 'calls': stats['count'], 'p50 (ms)': round(stats['p50_ms'], 2),
+             'p95 (ms)': round(stats['p95_ms'], 2), 'p99 (ms)': round(stats['p99_ms'], 2),
+             'total (ms)': round(stats['total_ms'], 1)}
+            for name, stats in sorted(summary.items(), key=lambda item: -item[1]['total_ms'])]
+    st.dataframe(rows, hide_index=True)
+
+    if st.button("Clear samples", key="perf_clear"):
+        timer.clear()
+        st.rerun()
+
+def display_profiles(profiler):
+    st.markdown("### Profiles")
+    st.caption("cProfile of a user's next full reruns, added into one pstats file. "
+               "Add ?profile=N to the portal URL to profile your own.")
+    with st.form("profile_form"):
+        col1, col2 = st.columns([3, 1])
+        username = col1.text_input("Username")
+        runs = col2.number_input("Reruns", min_value=1, max_value=profiler.max_runs, value=5)
+        if st.form_submit_button("Start profiling") and username:
+            runs = profiler.arm(username.strip(), runs)
+            st.success(f"Profiling the next {runs} reruns of {username.strip()}.")
+
+    for name, (done, left, _) in profiler.pending().items():
+        col1, col2 = st.columns([3, 1])
+        col1.write(f"**{name}**: {done} reruns profiled, {left} to go")
+        if col2.button("Save now", key=f"profile_save_{name}"):
+            profiler.save(name)
+            st.rerun()
+
+    files = profiler.files()
+    if not files:
+        st.info("No saved profiles yet.")
+        return
+    name = st.selectbox("Saved profiles (newest first)", files, key="profile_file")
+    path = profiler.path(name)
+    if path is None:  # Rotated away since the list was read
+        st.rerun()
+    with open(path, 'rb') as f:
+        st.download_button("Download", f.read(), file_name=name, mime="application/octet-stream",
+                           key="profile_download")
+    st.caption(f"{os.path.getsize(path) // 1024} KB; open with python -m pstats {name}, or snakeviz.")
+    st.dataframe([{'function': row['function'], 'calls': row['calls'], 'own (ms)': round(row['own_ms'], 2),
+                   'cumulative (ms)': round(row['cumulative_ms'], 2)} for row in top_functions(path)],
+                 hide_index=True)
+
+if __name__ == "__main__":
+    main()
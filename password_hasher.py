@@ -0,0 +1,118 @@
+"""Salted, versioned password hashing with the KDF work done on a bounded worker pool.
+
+Encoded hashes carry their algorithm and cost so they can be verified after
+the configured cost changes:
+
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+Bare 64-character hex strings are the legacy unsalted SHA-256 hashes; they
+still verify, and ``needs_rehash`` reports them so callers can upgrade them.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def derive(algorithm, params, password, salt):
+    """Run the KDF. hashlib releases the GIL for the whole derivation."""
+    if algorithm == 'scrypt':
+        n, r, p = params
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024,
+                              dklen=KEY_BYTES)
+    if algorithm == 'pbkdf2_sha256':
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations, dklen=KEY_BYTES)
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+def parse(encoded):
+    """Split an encoded hash into (algorithm, params, salt, digest); legacy hashes give 'sha256'."""
+    if '$' not in encoded:
+        return 'sha256', (), b'', encoded
+    algorithm, *fields = encoded.split('$')
+    if len(fields) < 2:
+        raise ValueError("Malformed password hash")
+    salt, digest = bytes.fromhex(fields[-2]), bytes.fromhex(fields[-1])
+    return algorithm, tuple(int(field) for field in fields[:-2]), salt, digest
+
+
+class PasswordHasher:
+    """Hash and verify passwords with scrypt or PBKDF2.
+
+    KDF calls run on a pool of ``max_workers`` threads (one per core by
+    default). hashlib drops the GIL while deriving, so a login burst uses every
+    core without stalling the sessions served by the same process. A process
+    pool is deliberately not used: its spawned workers would re-execute the
+    Streamlit script, which Streamlit installs as ``__main__``. At most
+    ``max_pending`` calls are queued at a time; further callers wait for a
+    slot. ``max_workers=0`` hashes inline.
+    """
+
+    def __init__(self, algorithm='scrypt', scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 pbkdf2_iterations=600_000, max_workers=None, max_pending=None):
+        if algorithm == 'scrypt':
+            self.params = (scrypt_n, scrypt_r, scrypt_p)
+        elif algorithm == 'pbkdf2_sha256':
+            self.params = (pbkdf2_iterations,)
+        else:
+            raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, self.max_workers) * 4)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="password-hasher")
+        return self._pool
+
+    def _derive(self, algorithm, params, password, salt):
+        password = password.encode()
+        if not self.max_workers:
+            return derive(algorithm, params, password, salt)
+        with self._slots:
+            return self._executor().submit(derive, algorithm, params, password, salt).result()
+
+    def hash(self, password):
+        """Return an encoded hash of ``password`` with a fresh salt."""
+        salt = os.urandom(SALT_BYTES)
+        digest = self._derive(self.algorithm, self.params, password, salt)
+        fields = [self.algorithm, *(str(value) for value in self.params), salt.hex(), digest.hex()]
+        return '$'.join(fields)
+
+    def verify(self, password, encoded):
+        """Check ``password`` against any supported encoded hash."""
+        try:
+            algorithm, params, salt, digest = parse(encoded)
+        except ValueError:
+            return False
+        if algorithm == 'sha256':
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), digest)
+        try:
+            candidate = self._derive(algorithm, params, password, salt)
+        except ValueError:
+            return False
+        return hmac.compare_digest(candidate, digest)
+
+    def needs_rehash(self, encoded):
+        """True if ``encoded`` is legacy or uses a different algorithm or cost than configured."""
+        try:
+            algorithm, params, _, _ = parse(encoded)
+        except ValueError:
+            return True
+        return algorithm != self.algorithm or params != self.params
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,133 @@
+"""Lightweight timing of the portal's script sections and helper functions.
+
+Samples ``(name, seconds)`` go into a bounded in-process ring buffer shared
+by every session, so memory stays flat however long the server runs. Three
+ways of taking them:
+
+- ``begin_run`` at the top of the script, ``lap(name)`` at the end of each
+  top-level section (time since the previous lap) and ``end_run`` at the
+  bottom, which records the whole run as ``SCRIPT``;
+- ``with timer.section(name):`` around a block;
+- ``@timer.timed(name)`` on a function.
+
+With timing disabled (GYAAN_PERF_TIMING=0) ``timed`` returns the function
+itself, ``section`` a shared no-op context and the lap calls return at once,
+so the instrumentation costs next to nothing.
+"""
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+SCRIPT = "script (total)"
+_NULL_SECTION = contextlib.nullcontext()
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+class _Section:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.timer._clock()
+
+    def __exit__(self, *exc_info):
+        self.timer.record(self.name, self.timer._clock() - self.start)
+
+
+class SectionTimer:
+    """Ring buffer of the latest ``capacity`` timing samples; ``summary`` aggregates them."""
+
+    def __init__(self, capacity=20_000, enabled=True, clock=time.perf_counter):
+        self.enabled = enabled
+        self._clock = clock
+        self._samples = deque(maxlen=capacity)
+        self._local = threading.local()  # Lap state of the script run on this thread
+
+    def record(self, name, seconds):
+        self._samples.append((name, seconds))
+
+    def begin_run(self):
+        if self.enabled:
+            self._local.start = self._local.last = self._clock()
+
+    def lap(self, name):
+        """Record the time since the previous lap (or ``begin_run``) as ``name``."""
+        if not self.enabled or getattr(self._local, 'last', None) is None:
+            return
+        now = self._clock()
+        self._samples.append((name, now - self._local.last))
+        self._local.last = now
+
+    def end_run(self):
+        if not self.enabled or getattr(self._local, 'start', None) is None:
+            return
+        self._samples.append((SCRIPT, self._clock() - self._local.start))
+        self._local.start = self._local.last = None
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def timed(self, name=None):
+        """Decorator recording each call of the function as ``name`` (its name by default)."""
+        def decorate(function):
+            if not self.enabled:
+                return function
+            label = name or function.__name__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                start = self._clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self._samples.append((label, self._clock() - start))
+            return wrapper
+        return decorate
+
+    def clear(self):
+        self._samples.clear()
+
+    def summary(self):
+        """``{name: {count, p50_ms, p95_ms, p99_ms, total_ms}}`` over the samples in the buffer."""
+        by_name = {}
+        for name, seconds in self._samples.copy():
+            by_name.setdefault(name, []).append(seconds)
+        result = {}
+        for name, samples in by_name.items():
+            samples.sort()
+            result[name] = {
+                'count': len(samples),
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p95_ms': percentile(samples, 0.95) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000,
+                'total_ms': sum(samples) * 1000,
+            }
+        return result
+
+
+_default_timer = None
+_default_lock = threading.Lock()
+
+
+def default_timer():
+    """Process-wide timer shared by the main script and its pages, configured from the environment."""
+    global _default_timer
+    if _default_timer is None:
+        with _default_lock:
+            if _default_timer is None:
+                _default_timer = SectionTimer(
+                    capacity=int(os.environ.get("GYAAN_PERF_TIMING_SAMPLES", "20000")),
+                    enabled=os.environ.get("GYAAN_PERF_TIMING", "1") != "0")
+    return _default_timer
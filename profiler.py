@@ -0,0 +1,183 @@
+"""On-demand cProfile of the next few full reruns of one user's sessions.
+
+An admin arms the profiler for a username and a number of reruns
+(``arm``). The main script calls ``start(username)`` near its top and
+``stop(profile)`` at its bottom. ``start`` returns None unless that user is
+armed, so unprofiled reruns pay one dict lookup. The reruns are added into
+one ``pstats`` profile, saved to the profile directory once the requested
+number has run (or earlier with ``save``). Only the newest ``max_files``
+profiles are kept.
+
+A rerun cut short by ``st.rerun`` or an exception never reaches ``stop``.
+Its profile is still enabled, so the next ``start`` closes it and counts it.
+
+Fragment reruns skip the top of the script, so they are not profiled. On
+Python 3.12+ only one cProfile can be enabled at a time. A rerun that
+overlaps another profiled one is skipped, and the next rerun is profiled
+instead.
+"""
+import cProfile
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime
+
+SUFFIX = ".pstats"
+
+
+class _Pending:
+    __slots__ = ('remaining', 'runs', 'stats', 'armed_at')
+
+    def __init__(self, runs):
+        self.remaining = runs
+        self.runs = 0
+        self.stats = None
+        self.armed_at = time.time()
+
+
+class RerunProfiler:
+    """Profiles armed users' reruns into at most ``max_files`` pstats files in ``directory``."""
+
+    def __init__(self, directory, max_files=20, max_runs=50):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_runs = max_runs
+        self._pending = {}  # lower-case username -> _Pending
+        self._running = {}  # thread -> (username, profile) of reruns being profiled
+        self._lock = threading.Lock()
+        self.stats = {'armed': 0, 'profiled_runs': 0, 'skipped_runs': 0, 'saved': 0, 'rotated': 0}
+
+    def arm(self, username, runs):
+        """Profile the next ``runs`` full reruns of ``username`` (capped at ``max_runs``); returns the count."""
+        runs = max(1, min(int(runs), self.max_runs))
+        with self._lock:
+            self._pending[username.lower()] = _Pending(runs)
+            self.stats['armed'] += 1
+        return runs
+
+    def pending(self):
+        """``{username: (runs done, runs left, armed at)}`` of users still being profiled."""
+        with self._lock:
+            return {key: (entry.runs, entry.remaining, entry.armed_at) for key, entry in self._pending.items()}
+
+    def start(self, username):
+        """Enable a profile for this rerun when ``username`` is armed; pass the result to ``stop``."""
+        if not username or username.lower() not in self._pending:
+            return None
+        self._close_abandoned()
+        key = username.lower()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another profile is enabled (Python 3.12+ allows one at a time)
+            self.stats['skipped_runs'] += 1
+            return None
+        with self._lock:
+            self._running[threading.current_thread()] = (key, profile)
+        return profile
+
+    def stop(self, profile):
+        if profile is None:
+            return
+        profile.disable()
+        with self._lock:
+            key, _ = self._running.pop(threading.current_thread(), (None, None))
+        if key is not None:
+            self._add(key, profile)
+
+    def _close_abandoned(self):
+        """Count the profiles of reruns that ended without ``stop`` (``st.rerun``, errors, dead threads)."""
+        current = threading.current_thread()
+        with self._lock:
+            abandoned = [(thread, key, profile) for thread, (key, profile) in self._running.items()
+                         if thread is current or not thread.is_alive()]
+            for thread, _, _ in abandoned:
+                del self._running[thread]
+        for _, key, profile in abandoned:
+            profile.disable()
+            self._add(key, profile)
+
+    def _add(self, key, profile):
+        profile.create_stats()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                return
+            if entry.stats is None:
+                entry.stats = pstats.Stats(profile)
+            else:
+                entry.stats.add(profile)
+            entry.runs += 1
+            entry.remaining -= 1
+            self.stats['profiled_runs'] += 1
+            done = entry.remaining <= 0
+        if done:
+            self.save(key)
+
+    def save(self, username):
+        """Write what was collected for ``username`` so far and disarm it; returns the file path or None."""
+        with self._lock:
+            entry = self._pending.pop(username.lower(), None)
+        if entry is None or entry.stats is None:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', username.lower())
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{safe_name}-{entry.runs}runs{SUFFIX}"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry.stats.dump_stats(tmp_path)
+        os.replace(tmp_path, path)
+        self.stats['saved'] += 1
+        self._rotate()
+        return path
+
+    def _rotate(self):
+        for name in self.files()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.stats['rotated'] += 1
+            except OSError:
+                pass
+
+    def files(self):
+        """Saved profile file names, newest first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(SUFFIX)]
+        except FileNotFoundError:
+            return []
+        return sorted(names, reverse=True)  # Names start with the save time
+
+    def path(self, name):
+        """Full path of a saved profile, or None for names that are not one."""
+        if name not in self.files():
+            return None
+        return os.path.join(self.directory, name)
+
+
+def top_functions(path, limit=20):
+    """``[{function, calls, own_ms, cumulative_ms}]`` of a saved profile, by cumulative time."""
+    stats = pstats.Stats(path).stats
+    rows = [{'function': f"{func} ({os.path.basename(filename)}:{line})", 'calls': calls,
+             'own_ms': own * 1000, 'cumulative_ms': cumulative * 1000}
+            for (filename, line, func), (_, calls, own, cumulative, _) in stats.items()]
+    rows.sort(key=lambda row: -row['cumulative_ms'])
+    return rows[:limit]
+
+
+_default_profiler = None
+_default_lock = threading.Lock()
+
+
+def default_profiler():
+    """Process-wide profiler shared by the main script and the performance page, configured from the environment."""
+    global _default_profiler
+    if _default_profiler is None:
+        with _default_lock:
+            if _default_profiler is None:
+                _default_profiler = RerunProfiler(
+                    os.environ.get("GYAAN_PROFILE_DIR", "profiles"),
+                    max_files=int(os.environ.get("GYAAN_PROFILE_MAX_FILES", "20")),
+                    max_runs=int(os.environ.get("GYAAN_PROFILE_MAX_RUNS", "50")))
+    return _default_profiler
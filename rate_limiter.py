@@ -0,0 +1,92 @@
+"""Admission control for credential checks: per-identity token buckets plus a concurrency cap.
+
+Every check is O(1). Buckets live in LRU-ordered dicts capped at
+``max_buckets`` entries; evicting the least recently used bucket is safe
+because an idle bucket has refilled and behaves like a fresh one.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    """Token bucket per key: ``burst`` capacity refilled at ``rate`` tokens per second."""
+
+    def __init__(self, rate, burst, max_buckets=10_000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost=1.0):
+        """Take ``cost`` tokens from ``key``'s bucket; False if it does not hold enough."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens, updated = bucket
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Rate-limit credential checks by username and by client, and cap how many run at once.
+
+    ``acquire`` returns None when the caller may proceed (and must then call
+    ``release``), or a user-facing reason when it was rejected. Callers wait
+    at most ``queue_timeout`` seconds for a free slot, and are rejected at
+    once when ``max_queue`` callers are already waiting.
+    """
+
+    def __init__(self, identity_rate=5 / 60, identity_burst=5, client_rate=30 / 60, client_burst=30,
+                 max_in_flight=8, max_queue=32, queue_timeout=5.0, max_buckets=10_000):
+        self.identities = TokenBuckets(identity_rate, identity_burst, max_buckets)
+        self.clients = TokenBuckets(client_rate, client_burst, max_buckets)
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.counters = {'admitted': 0, 'rejected_rate': 0, 'rejected_busy': 0}
+
+    def acquire(self, identity, client):
+        if not self.clients.allow(client) or not self.identities.allow((identity or '').lower()):
+            self.counters['rejected_rate'] += 1
+            return "Too many attempts. Please wait a minute and try again."
+        with self._slots:
+            if self.in_flight >= self.max_in_flight:
+                if self.queued >= self.max_queue:
+                    self.counters['rejected_busy'] += 1
+                    return "The server is busy. Please try again in a moment."
+                self.queued += 1
+                try:
+                    admitted = self._slots.wait_for(lambda: self.in_flight < self.max_in_flight,
+                                                    timeout=self.queue_timeout)
+                finally:
+                    self.queued -= 1
+                if not admitted:
+                    self.counters['rejected_busy'] += 1
+                    return "The server is busy. Please try again in a moment."
+            self.in_flight += 1
+            self.counters['admitted'] += 1
+        return None
+
+    def release(self):
+        with self._slots:
+            self.in_flight -= 1
+            self._slots.notify()
+
@@ -0,0 +1,101 @@
+"""Choose which replica of an app a logged-in user's "Open" link points to.
+
+An app listed with several replicas in apps.json gets one URL per user. A new
+assignment goes to the replica with the lowest score
+
+    (sessions + 1) * latency * (1 + ERROR_PENALTY * error_rate)
+
+where ``sessions`` counts the users currently assigned to it and latency and
+error rate are the health prober's moving averages, so a fast replica takes
+more users without taking all of them. Replicas the prober reports down are
+skipped while any other is left, and so are replicas failing more than
+MAX_ERROR_RATE of their health checks while a healthier one is up. An
+assignment is sticky: the user keeps the same replica (and its Streamlit
+session) until it goes down, leaves the registry, or the assignment has not
+been used for ``sticky_ttl`` seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+ERROR_PENALTY = 10.0
+MAX_ERROR_RATE = 0.2  # replicas failing more of their checks only get users when nothing better is up
+DEFAULT_LATENCY = 0.5  # seconds, for a replica without a probe result yet
+
+
+class ReplicaSelector:
+    """Sticky, load- and latency-aware choice among ``app.replicas``; ``prober`` is a ``HealthProber``.
+
+    ``stats`` counts picks, sticky hits, new assignments and reassignments
+    away from a replica that went down or was removed.
+    """
+
+    def __init__(self, prober, sticky_ttl=12 * 3600, max_assignments=100_000, clock=time.monotonic):
+        self.prober = prober
+        self.sticky_ttl = sticky_ttl
+        self.max_assignments = max_assignments
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._assignments = OrderedDict()  # (app id, username) -> (url, last used), least recently used first
+        self._sessions = {}  # url -> users assigned to it
+        self.stats = {'picks': 0, 'sticky': 0, 'assigned': 0, 'reassigned': 0}
+
+    def sessions(self):
+        """Users currently assigned to each replica URL."""
+        with self._lock:
+            return dict(self._sessions)
+
+    def _release(self, url):
+        self._sessions[url] -= 1
+        if not self._sessions[url]:
+            del self._sessions[url]
+
+    def _expire(self, now):
+        while self._assignments:
+            key, (url, used) = next(iter(self._assignments.items()))
+            if now - used <= self.sticky_ttl and len(self._assignments) <= self.max_assignments:
+                break
+            del self._assignments[key]
+            self._release(url)
+
+    def _score(self, url):
+        health = self.prober.get(url)
+        latency = health.latency_ewma if health is not None and health.latency_ewma is not None else DEFAULT_LATENCY
+        error_rate = health.error_rate if health is not None else 0.0
+        return (self._sessions.get(url, 0) + 1) * latency * (1 + ERROR_PENALTY * error_rate)
+
+    def _is_down(self, url):
+        health = self.prober.get(url)
+        return health is not None and health.state == 'down'
+
+    def _is_failing(self, url):
+        health = self.prober.get(url)
+        return health is not None and health.error_rate > MAX_ERROR_RATE
+
+    def _candidates(self, replicas):
+        up = [url for url in replicas if not self._is_down(url)]
+        return [url for url in up if not self._is_failing(url)] or up or list(replicas)
+
+    def pick(self, app, username):
+        """Replica URL for ``username`` to open ``app`` with."""
+        if len(app.replicas) < 2:
+            return app.url
+        key = (app.id, username.lower())
+        now = self._clock()
+        with self._lock:
+            self.stats['picks'] += 1
+            self._expire(now)
+            assignment = self._assignments.pop(key, None)
+            if assignment is not None:
+                url = assignment[0]
+                if url in app.replicas and not self._is_down(url):
+                    self._assignments[key] = (url, now)
+                    self.stats['sticky'] += 1
+                    return url
+                self._release(url)
+                self.stats['reassigned'] += 1
+            url = min(self._candidates(app.replicas), key=self._score)
+            self._assignments[key] = (url, now)
+            self._sessions[url] = self._sessions.get(url, 0) + 1
+            self.stats['assigned'] += 1
+            return url
@@ -0,0 +1,154 @@
+"""Password reset tokens kept in memory, indexed by expiry, and swept in the background.
+
+Tokens live in a dict (O(1) lookup and consumption) plus a min-heap of
+(expiry, token) used by the sweeper to find expired tokens without scanning.
+reset_tokens.json remains the shared, persistent copy: every change goes
+through ``JsonFileStore.update`` and the sweeper removes a whole batch of
+expired tokens with a single write.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(expiry):
+    return datetime.fromisoformat(expiry).timestamp()
+
+
+class ResetTokenStore:
+    """Reset tokens backed by an ``atomic_store.JsonFileStore``.
+
+    ``on_error`` is called with the exception when reading or writing the file
+    fails, after which the method returns its failure value.
+    """
+
+    def __init__(self, file_store, on_error=None, clock=time.time):
+        self._file = file_store
+        self._on_error = on_error
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._source = None
+        self._tokens = {}
+        self._expiry = {}
+        self._heap = []
+
+    def _error(self, exc):
+        if self._on_error is not None:
+            self._on_error(exc)
+
+    def _rebuild(self, tokens):
+        self._tokens = dict(tokens)
+        self._expiry = {token: _timestamp(data['expiry']) for token, data in tokens.items()}
+        self._heap = [(expiry, token) for token, expiry in self._expiry.items()]
+        heapq.heapify(self._heap)
+        self._source = tokens
+
+    def _refresh(self):
+        tokens = self._file.load()
+        if tokens is not self._source:
+            with self._lock:
+                self._rebuild(tokens)
+
+    def _write(self, adds=None, removes=()):
+        """Persist a change and mirror it in memory; returns the removed records."""
+        def mutate(tokens):
+            with self._lock:
+                if tokens.keys() != self._tokens.keys():
+                    # Another worker changed the file since we last looked
+                    self._rebuild(tokens)
+                removed = {}
+                for token in removes:
+                    record = tokens.pop(token, None)
+                    self._tokens.pop(token, None)
+                    self._expiry.pop(token, None)
+                    if record is not None:
+                        removed[token] = record
+                for token, record in (adds or {}).items():
+                    tokens[token] = record
+                    self._tokens[token] = record
+                    self._expiry[token] = _timestamp(record['expiry'])
+                    heapq.heappush(self._heap, (self._expiry[token], token))
+                self._source = tokens
+                return removed
+        return self._file.update(mutate)
+
+    def add(self, token, username, expiry):
+        try:
+            self._write(adds={token: {'username': username, 'expiry': expiry}})
+        except Exception as e:
+            self._error(e)
+            return False
+        return True
+
+    def get(self, token):
+        try:
+            self._refresh()
+        except Exception as e:
+            self._error(e)
+            return None
+        return self._tokens.get(token)
+
+    def delete(self, token):
+        if self.get(token) is None:
+            return False
+        try:
+            return token in self._write(removes=[token])
+        except Exception as e:
+            self._error(e)
+            return False
+
+    def consume(self, token):
+        """Remove ``token`` and return its username if it existed and has not expired.
+
+        Removal happens under the file lock, so two workers cannot both consume it.
+        """
+        if self.get(token) is None:
+            return None
+        try:
+            record = self._write(removes=[token]).get(token)
+        except Exception as e:
+            self._error(e)
+            return None
+        if record is None or _timestamp(record['expiry']) < self._clock():
+            return None
+        return record['username']
+
+    def sweep(self, max_batch=1000):
+        """Drop up to ``max_batch`` expired tokens with one write; returns how many."""
+        self._refresh()
+        now = self._clock()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(expired) < max_batch:
+                expiry, token = heapq.heappop(self._heap)
+                if self._expiry.get(token) == expiry:
+                    expired.append(token)
+        if not expired:
+            return 0
+        try:
+            return len(self._write(removes=expired))
+        except Exception:
+            with self._lock:
+                for token in expired:
+                    if token in self._expiry:
+                        heapq.heappush(self._heap, (self._expiry[token], token))
+            raise
+
+
+def start_sweeper(sweep, interval=60.0):
+    """Call ``sweep()`` every ``interval`` seconds in a daemon thread."""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                sweep()
+            except Exception:
+                logger.exception("Reset token sweep failed")
+
+    thread = threading.Thread(target=run, name="reset-token-sweeper", daemon=True)
+    thread.start()
+    return thread
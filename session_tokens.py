@@ -0,0 +1,97 @@
+"""Stateless, HMAC-signed, expiring session tokens shared by the portal and the Gyaan apps.
+
+A token looks like ``v1.<key id>.<payload>.<signature>``: the payload is
+base64url JSON with ``sub`` (username), ``role``, ``iat`` and ``exp`` (Unix
+seconds) and the signature is HMAC-SHA256 over everything before it.
+
+Downstream apps only need this file and the shared keys:
+
+    from session_tokens import KeySet, verify_token
+    keys = KeySet.from_env()          # GYAAN_TOKEN_KEYS="2025a:secret,2024b:old-secret"
+    claims = verify_token(token, keys)  # dict, or None if forged/expired/unknown key
+
+Verification does no network or file I/O. Keys are rotated by adding a new
+key id in front of the list (it becomes the signing key) and dropping the
+old one once its tokens have expired.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+VERSION = "v1"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class KeySet:
+    """Signing keys by key id; the first key is used to sign, all of them verify."""
+
+    def __init__(self, keys):
+        if not keys:
+            raise ValueError("KeySet needs at least one key")
+        self.keys = {kid: secret.encode() if isinstance(secret, str) else secret for kid, secret in keys}
+        self.active_kid = keys[0][0]
+
+    @classmethod
+    def from_string(cls, spec):
+        """Parse ``"kid:secret,kid2:secret2"`` (first entry signs)."""
+        keys = []
+        for item in spec.split(","):
+            kid, sep, secret = item.strip().partition(":")
+            if not sep or not kid or not secret or "." in kid:
+                raise ValueError(f"Invalid token key entry: {item!r}")
+            keys.append((kid, secret))
+        return cls(keys)
+
+    @classmethod
+    def from_env(cls, name="GYAAN_TOKEN_KEYS", default=None):
+        spec = os.environ.get(name, default)
+        if not spec:
+            raise ValueError(f"{name} is not set")
+        return cls.from_string(spec)
+
+
+def _signature(key, signing_input):
+    return _b64encode(hmac.new(key, signing_input.encode(), hashlib.sha256).digest())
+
+
+def sign_token(keys, username, role="USER", ttl=12 * 3600, now=None):
+    """Return (token, expiry) for ``username`` signed with the active key."""
+    issued_at = int(time.time() if now is None else now)
+    claims = {"sub": username, "role": role, "iat": issued_at, "exp": issued_at + int(ttl)}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":"), sort_keys=True).encode())
+    signing_input = f"{VERSION}.{keys.active_kid}.{payload}"
+    return f"{signing_input}.{_signature(keys.keys[keys.active_kid], signing_input)}", claims["exp"]
+
+
+def verify_token(token, keys, now=None, leeway=30):
+    """Return the token's claims if the signature is valid and it has not expired, else None."""
+    try:
+        version, kid, payload, signature = token.split(".")
+    except (AttributeError, ValueError):
+        return None
+    key = keys.keys.get(kid)
+    if version != VERSION or key is None:
+        return None
+    # Compare bytes: the signature comes from the URL, and compare_digest rejects non-ASCII str
+    if not hmac.compare_digest(_signature(key, f"{version}.{kid}.{payload}").encode(), signature.encode()):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+        expiry = claims["exp"]
+        issued_at = claims["iat"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    current = time.time() if now is None else now
+    if current > expiry + leeway or issued_at > current + leeway:
+        return None
+    return claims
@@ -0,0 +1,142 @@
+"""Build-time pipeline that produces card-sized WebP and JPEG variants of the card images.
+
+Cards display images 150px high, so shipping the 1024-2048px originals is
+wasted bytes. ``python thumbnails.py build`` writes 1x and 2x variants into
+artifacts/thumbs/ under content-hashed names and records them in
+artifacts/thumbs/manifest.json. Sources whose size and mtime match the
+manifest are skipped; the rest are re-hashed and only re-encoded when their
+content changed. ``lookup`` is what the card renderer uses at runtime to
+offer the browser a WebP ``srcset`` with a JPEG fallback; it only reads the
+(cached) manifest and never needs PIL.
+"""
+import argparse
+import glob
+import hashlib
+import os
+
+import json_cache
+from atomic_store import atomic_write_json
+
+CARD_HEIGHT = 150
+DENSITIES = (1, 2)
+THUMBS_DIR = os.path.join("artifacts", "thumbs")
+MANIFEST_NAME = "manifest.json"
+CARD_BACKGROUND = (249, 250, 251)  # .card-image background, used to flatten transparency for JPEG
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _manifest_path(root):
+    return os.path.join(root, THUMBS_DIR, MANIFEST_NAME)
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _render_variants(source_path, digest, root, out_dir, height):
+    from PIL import Image
+
+    variants = {}
+    with Image.open(source_path) as image:
+        image.load()
+        for density in DENSITIES:
+            target_height = min(height * density, image.height)
+            target_width = max(1, round(image.width * target_height / image.height))
+            resized = image.resize((target_width, target_height), Image.LANCZOS)
+            for extension, (pil_format, options) in FORMATS.items():
+                variant = resized
+                if pil_format == 'JPEG' and variant.mode != 'RGB':
+                    background = Image.new('RGB', variant.size, CARD_BACKGROUND)
+                    if 'A' in variant.getbands():
+                        background.paste(variant.convert('RGBA'), mask=variant.convert('RGBA').getchannel('A'))
+                    else:
+                        background.paste(variant.convert('RGB'))
+                    variant = background
+                name = f"{digest[:16]}-{height}h@{density}x.{extension}"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    tmp_path = f"{path}.tmp"
+                    variant.save(tmp_path, pil_format, **options)
+                    os.replace(tmp_path, path)
+                variants[f"{density}x.{extension}"] = os.path.relpath(path, root).replace(os.sep, '/')
+    return variants
+
+
+def build(sources, root='.', height=CARD_HEIGHT):
+    """Generate variants for ``sources`` (paths relative to ``root``); returns (manifest, rebuilt paths)."""
+    out_dir = os.path.join(root, THUMBS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = _manifest_path(root)
+    manifest = dict(json_cache.load(manifest_path, default={}))
+    rebuilt = []
+    for source in sources:
+        source_path = os.path.join(root, source)
+        stat = os.stat(source_path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        entry = manifest.get(source)
+        if entry and entry['signature'] == signature and entry['height'] == height:
+            continue
+        digest = _file_digest(source_path)
+        if not (entry and entry['sha256'] == digest and entry['height'] == height):
+            entry = {'sha256': digest, 'height': height,
+                     'variants': _render_variants(source_path, digest, root, out_dir, height)}
+            rebuilt.append(source)
+        manifest[source] = {**entry, 'signature': signature}
+
+    live = {os.path.basename(path) for entry in manifest.values() for path in entry['variants'].values()}
+    for name in os.listdir(out_dir):
+        if name != MANIFEST_NAME and name not in live:
+            os.remove(os.path.join(out_dir, name))
+    atomic_write_json(manifest_path, manifest)
+    json_cache.store(manifest_path, manifest)
+    return manifest, rebuilt
+
+
+def lookup(image_path, root='.'):
+    """``{"<density>x.<extension>": path relative to root}`` of the built variants of ``image_path``, or None."""
+    entry = json_cache.load(_manifest_path(root), default={}).get(image_path)
+    return entry['variants'] if entry else None
+
+
+def srcset(variants, extension, url=lambda path: path):
+    """``srcset`` of the 1x and 2x ``extension`` variants from ``lookup``; ``url`` maps a path to its URL."""
+    return ", ".join(f"{url(variants[f'{density}x.{extension}'])} {density}x" for density in DENSITIES)
+
+
+def default_sources(root='.'):
+    """Top-level card images in artifacts/."""
+    paths = []
+    for pattern in ('*.jpg', '*.jpeg', '*.png'):
+        paths.extend(glob.glob(os.path.join(root, 'artifacts', pattern)))
+    return sorted(os.path.relpath(path, root).replace(os.sep, '/') for path in paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gyaan card thumbnail pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="generate card-sized variants of the card images")
+    build_parser.add_argument("sources", nargs="*", help="images relative to --root (default: artifacts/*)")
+    build_parser.add_argument("--root", default=os.path.dirname(os.path.abspath(__file__)))
+    build_parser.add_argument("--height", type=int, default=CARD_HEIGHT)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        sources = args.sources or default_sources(args.root)
+        manifest, rebuilt = build(sources, args.root, args.height)
+        for source in sources:
+            original = os.path.getsize(os.path.join(args.root, source))
+            sizes = ", ".join(f"{name} {os.path.getsize(os.path.join(args.root, path)) // 1024} KB"
+                              for name, path in sorted(manifest[source]['variants'].items()))
+            status = "built" if source in rebuilt else "up to date"
+            print(f"{source} ({original // 1024} KB, {status}): {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import threading
+
+
+def normalize(value):
+    """Normalize a username or email for case-insensitive lookups."""
+    return (value or "").lower()
+
+
+class DuplicateUserError(ValueError):
+    """A new user's username or email (``field``) is already taken, possibly by another worker."""
+
+    def __init__(self, field, value):
+        super().__init__(f"{field} already exists: {value}")
+        self.field = field
+
+
+class UserDirectory:
+    """In-memory view of users.json with case-insensitive username and email indexes.
+
+    ``load`` returns the users mapping and ``append`` durably records one change
+    entry (see user_journal) and applies it to that mapping; both are supplied
+    by the app so its existing error reporting stays in one place. ``load`` is
+    expected to return the same object until another worker writes, so the
+    indexes are only rebuilt from scratch in that case. With ``changes`` (see
+    ``UserJournal.changes``) the loader may also update that object in place
+    and only the users it reports changed are re-indexed.
+    """
+
+    def __init__(self, load, append, changes=None):
+        self._load = load
+        self._append = append
+        self._changes = changes
+        self._since = None
+        self._lock = threading.RLock()
+        self.users = None
+        self._by_username = {}
+        self._by_email = {}
+        # Names and emails of signups whose journal append is still in flight
+        self._reserved = set()
+
+    def _index(self, users):
+        by_username = {}
+        by_email = {}
+        for username, data in list(users.items()):  # The loader may add users meanwhile
+            by_username.setdefault(normalize(username), username)
+            email = normalize(data.get('email', ''))
+            if email:
+                by_email.setdefault(email, username)
+        self._by_username = by_username
+        self._by_email = by_email
+        self.users = users
+
+    def refresh(self):
+        """Re-index if the loader returned a different users mapping, or just the users ``changes`` reports."""
+        users = self._load()
+        if self._changes is None:
+            if users is not self.users:
+                with self._lock:
+                    self._index(users)
+            return
+        token, names = self._changes(self._since)
+        if users is self.users and names == ():
+            return
+        with self._lock:
+            if users is not self.users or names is None:
+                self._index(users)
+            else:
+                for username in names:
+                    self._index_user(username)
+            self._since = token
+
+    def get_username(self, username):
+        """Return the stored spelling of ``username``, or None."""
+        self.refresh()
+        return self._by_username.get(normalize(username))
+
+    def get_username_by_email(self, email):
+        """Return the username registered with ``email``, or None."""
+        self.refresh()
+        return self._by_email.get(normalize(email))
+
+    def find(self, username_or_email):
+        """Resolve a username or an email address to the stored username."""
+        return self.get_username(username_or_email) or self.get_username_by_email(username_or_email)
+
+    def get(self, username):
+        """Return the user record for ``username`` (case insensitive), or None."""
+        actual_username = self.get_username(username)
+        if actual_username is None:
+            return None
+        return self.users.get(actual_username)
+
+    def add(self, username, data):
+        """Insert a new user and persist. Returns (success, message)."""
+        username_key = ('username', normalize(username))
+        email_key = ('email', normalize(data.get('email', '')))
+        with self._lock:
+            self.refresh()
+            if username_key[1] in self._by_username or username_key in self._reserved:
+                return False, "Username already exists"
+            if email_key[1] in self._by_email or email_key in self._reserved:
+                return False, "Email already exists"
+            self._reserved.update((username_key, email_key))
+        # Append outside the lock so concurrent signups share one journal fsync
+        appended = False
+        try:
+            appended = self._append({'op': 'create', 'username': username, 'data': data})
+        except DuplicateUserError as e:  # Taken by another worker since our index was built
+            return False, f"{e.field.capitalize()} already exists"
+        finally:
+            with self._lock:
+                self._reserved.difference_update((username_key, email_key))
+                if appended:
+                    self.refresh()
+                    self._index_user(username)
+        if not appended:
+            return False, "Error creating user"
+        return True, "User created successfully"
+
+    def update(self, username, **fields):
+        """Update fields of an existing user and persist. Returns True on success."""
+        actual_username = self.get_username(username)
+        if actual_username is None:
+            return False
+        old_email = normalize(self.users[actual_username].get('email', ''))
+        if not self._append({'op': 'update', 'username': actual_username, 'fields': fields}):
+            return False
+        with self._lock:
+            self.refresh()
+            if self._by_email.get(old_email) == actual_username:
+                del self._by_email[old_email]
+            self._index_user(actual_username)
+        return True
+
+    def _index_user(self, username):
+        self._by_username.setdefault(normalize(username), username)
+        email = normalize(self.users.get(username, {}).get('email', ''))
+        if email:
+            self._by_email.setdefault(email, username)
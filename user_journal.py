@@ -0,0 +1,258 @@
+"""Append-only journal of user changes on top of the users.json snapshot.
+
+Each change is one JSON line, fsync'd before the call returns, so a signup or
+password change costs a few hundred bytes instead of rewriting every user.
+Appends from concurrent sessions are group-committed into one write and
+fsync, under the same cross-process lock the compactor takes while it folds
+the journal into a fresh snapshot.
+
+Entries are idempotent (``create`` sets a record, ``update`` merges fields),
+so replaying an entry that is already part of the snapshot is harmless.
+A ``create`` is checked again under the lock against every worker's users,
+and one whose username or email is taken (case insensitive) is not written:
+its ``append`` raises ``DuplicateUserError``.
+
+Entries appended by other workers are applied to the loaded mapping in place
+and their usernames logged, so readers (``changes``) re-index only those
+users. Only a new snapshot, a truncated journal or an email change forces a
+full rebuild.
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from atomic_store import GroupCommit, atomic_write_json, file_lock
+from user_directory import DuplicateUserError, normalize
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_SIZE = 10_000  # usernames remembered for ``changes``; readers further behind rebuild
+
+
+def apply_entry(users, entry):
+    """Apply one journal entry to the users mapping in place."""
+    username = entry['username']
+    if entry['op'] == 'create':
+        users[username] = dict(entry['data'])
+    elif entry['op'] == 'update' and username in users:
+        users[username] = {**users[username], **entry['fields']}
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class UserJournal:
+    """Users state rebuilt from ``snapshot_path`` plus the entries in ``journal_path``.
+
+    ``load`` returns the same mapping object for as long as nothing else wrote
+    to the files; changes made through ``append`` or appended by other
+    processes are applied to it in place (see ``changes``). When another
+    process compacts, a new mapping is returned.
+    ``stats`` counts full reloads, bytes read, appended entries, write batches
+    and bytes written.
+    """
+
+    def __init__(self, snapshot_path, journal_path):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self._lock = threading.RLock()
+        self._users = None
+        self._snapshot_signature = None
+        self._offset = 0
+        self._commits = GroupCommit(self._write_entries)
+        self._compactor = None
+        self._taken = None  # (users mapping, lower-case usernames, lower-case emails) for create checks
+        self._generation = 0  # Bumped whenever readers must rebuild from the whole mapping
+        self._seq = 0  # Entries applied to the mapping since the last rebuild
+        self._log = deque(maxlen=CHANGE_LOG_SIZE)  # (seq, username) of those entries
+        self._stop = threading.Event()
+        self.stats = {'reloads': 0, 'bytes_read': 0, 'appends': 0, 'batches': 0, 'bytes_written': 0}
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def _read_entries(self, users, offset, apply=apply_entry):
+        """Apply complete journal lines after ``offset``; returns the new offset."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # torn write from a crash; ignore the partial tail
+                    offset += len(line)
+                    if line.strip():
+                        apply(users, json.loads(line))
+        except FileNotFoundError:
+            pass
+        return offset
+
+    def _apply(self, users, entry):
+        """Apply an entry to the live mapping and log it for ``changes``."""
+        apply_entry(users, entry)
+        username = entry['username']
+        if entry['op'] == 'update' and 'email' in entry['fields']:
+            self._rebuild()  # The old email has to leave the indexes
+            return
+        self._seq += 1
+        self._log.append((self._seq, username))
+        if entry['op'] == 'create' and self._taken is not None and self._taken[0] is users:
+            self._taken[1].add(normalize(username))
+            email = normalize(entry['data'].get('email', ''))
+            if email:
+                self._taken[2].add(email)
+
+    def _rebuild(self):
+        self._generation += 1
+        self._seq = 0
+        self._log.clear()
+        self._taken = None
+
+    def changes(self, since=None):
+        """``(token, usernames)`` changed since the ``token`` of an earlier call.
+
+        ``usernames`` is None when the caller has to re-index the whole
+        mapping: on the first call, after a new snapshot or a truncated journal
+        was loaded, after an email change, or when it fell too far behind.
+        """
+        token = (self._generation, self._seq)
+        if since == token:
+            return token, ()
+        with self._lock:
+            token = (self._generation, self._seq)
+            if since is None or since[0] != self._generation or since[1] > self._seq:
+                return token, None
+            names = set()
+            for seq, username in reversed(self._log):
+                if seq <= since[1]:
+                    return token, names
+                names.add(username)
+            return token, names if since[1] == self._seq - len(self._log) else None
+
+    def _reload(self):
+        signature = _signature(self.snapshot_path)
+        users = {}
+        if signature is not None:
+            with open(self.snapshot_path, 'r') as f:
+                users = json.load(f)
+        self._offset = self._read_entries(users, 0)
+        self._rebuild()
+        self.stats['reloads'] += 1
+        self.stats['bytes_read'] += (signature[1] if signature else 0) + self._offset
+        self._snapshot_signature = signature
+        self._users = users
+
+    def load(self):
+        """Return the current users mapping, catching up with other writers."""
+        with self._lock:
+            if self._users is None or _signature(self.snapshot_path) != self._snapshot_signature:
+                self._reload()
+                return self._users
+            size = self._journal_size()
+            if size < self._offset:
+                # Journal was truncated by a compaction we did not see the snapshot for yet
+                self._reload()
+            elif size > self._offset:
+                # Apply other workers' entries in place: readers re-index just those users
+                offset = self._read_entries(self._users, self._offset, self._apply)
+                self.stats['bytes_read'] += offset - self._offset
+                self._offset = offset
+            return self._users
+
+    def append(self, entry):
+        """Durably record ``entry`` and apply it to the in-memory state.
+
+        Raises DuplicateUserError for a ``create`` whose username or email is taken.
+        """
+        self._commits.submit(entry)
+
+    def _taken_names(self, users):
+        """Lower-case usernames and emails of ``users``, kept up to date by ``_apply``."""
+        if self._taken is None or self._taken[0] is not users:
+            records = list(users.items())
+            self._taken = (users, {normalize(name) for name, _ in records},
+                           {normalize(data.get('email', '')) for _, data in records} - {''})
+        return self._taken[1], self._taken[2]
+
+    def _check_creates(self, users, entries):
+        """Per-entry results: None, or DuplicateUserError for a create that clashes with a stored user."""
+        if not any(entry['op'] == 'create' for entry in entries):
+            return [None] * len(entries)
+        names, emails = self._taken_names(users)
+        batch = set()  # Names and emails taken by earlier creates of this batch
+        results = []
+        for entry in entries:
+            result = None
+            if entry['op'] == 'create':
+                name, email = normalize(entry['username']), normalize(entry['data'].get('email', ''))
+                if name in names or ('username', name) in batch:
+                    result = DuplicateUserError('username', entry['username'])
+                elif email and (email in emails or ('email', email) in batch):
+                    result = DuplicateUserError('email', entry['data']['email'])
+                else:
+                    batch.update((('username', name), ('email', email)))
+            results.append(result)
+        return results
+
+    def _write_entries(self, entries):
+        with file_lock(self.journal_path), self._lock:
+            users = self.load()
+            results = self._check_creates(users, entries)
+            entries = [entry for entry, result in zip(entries, results) if result is None]
+            data = b''.join((json.dumps(entry, separators=(',', ':')) + '\n').encode() for entry in entries)
+            with open(self.journal_path, 'ab') as f:
+                if f.tell() > self._offset:
+                    f.truncate(self._offset)  # drop a torn tail left by a crash
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._offset = f.tell()
+            for entry in entries:
+                self._apply(users, entry)
+        self.stats['appends'] += len(entries)
+        self.stats['batches'] += 1
+        self.stats['bytes_written'] += len(data)
+        return results
+
+    def compact(self):
+        """Write the current state as a new snapshot and empty the journal."""
+        with file_lock(self.journal_path), self._lock:
+            users = self.load()
+            if self._offset == 0:
+                return False
+            atomic_write_json(self.snapshot_path, users)
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(0)
+                os.fsync(f.fileno())
+            self._offset = 0
+            self._snapshot_signature = _signature(self.snapshot_path)
+            return True
+
+    def start_compactor(self, interval=60.0, min_bytes=64 * 1024):
+        """Compact in a daemon thread whenever the journal exceeds ``min_bytes``."""
+        if self._compactor is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                if self._journal_size() < min_bytes:
+                    continue
+                try:
+                    self.compact()
+                except Exception:
+                    logger.exception("User journal compaction failed")
+
+        self._compactor = threading.Thread(target=run, name="user-journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        self._stop.set()
@@ -0,0 +1,300 @@
+"""Pluggable storage backends for users and password reset tokens.
+
+Both backends expose the same methods as ``UserDirectory`` (``get``,
+``get_username``, ``get_username_by_email``, ``find``, ``add``, ``update``)
+plus ``add_reset_token``, ``get_reset_token``, ``delete_reset_token``,
+``consume_reset_token`` and ``sweep_reset_tokens``.
+
+Run ``python user_store.py migrate`` to import users.json (plus its change
+journal) and reset_tokens.json into the SQLite database.
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from user_directory import UserDirectory
+from user_journal import UserJournal
+
+USER_FIELDS = ('password', 'email', 'created_at', 'role')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    email TEXT NOT NULL DEFAULT '',
+    created_at TEXT,
+    role TEXT NOT NULL DEFAULT 'USER'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_lower ON users (lower(username));
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_lower ON users (lower(email)) WHERE email != '';
+CREATE TABLE IF NOT EXISTS reset_tokens (
+    token TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    expiry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reset_tokens_expiry ON reset_tokens (expiry);
+"""
+
+
+class JsonUserStore(UserDirectory):
+    """users.json (+ journal) / reset_tokens.json backend.
+
+    Reset tokens are delegated to a ``reset_tokens.ResetTokenStore``.
+    """
+
+    def __init__(self, load, append, reset_tokens, changes=None):
+        super().__init__(load, append, changes)
+        self.reset_tokens = reset_tokens
+
+    def add_reset_token(self, token, username, expiry):
+        return self.reset_tokens.add(token, username, expiry)
+
+    def get_reset_token(self, token):
+        return self.reset_tokens.get(token)
+
+    def delete_reset_token(self, token):
+        return self.reset_tokens.delete(token)
+
+    def consume_reset_token(self, token):
+        return self.reset_tokens.consume(token)
+
+    def sweep_reset_tokens(self):
+        return self.reset_tokens.sweep()
+
+
+class SqliteUserStore:
+    """SQLite backend in WAL mode with a pool of at most ``pool_size`` connections.
+
+    Each call checks a connection out for the duration of one transaction, so
+    the connections are shared by every session thread, whichever thread a
+    rerun runs on. A call waits up to ``timeout`` seconds for a free one.
+    ``on_error`` is called with the exception when a statement fails, after
+    which the method returns the same failure value the JSON backend would.
+    """
+
+    def __init__(self, path, on_error=None, timeout=30.0, pool_size=8):
+        self.path = path
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._on_error = on_error
+        self._pool = queue.LifoQueue()  # Idle connections; the most recently used is warmest
+        self._opened = 0
+        self._lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._opened < self.pool_size
+            if grow:
+                self._opened += 1
+        if grow:
+            try:
+                return self._open()
+            except sqlite3.Error:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("no database connection free in the pool") from None
+
+    @contextmanager
+    def _connection(self):
+        """A pooled connection, in a transaction committed on success and rolled back on error."""
+        conn = self._checkout()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _error(self, exc):
+        if self._on_error is not None:
+            self._on_error(exc)
+
+    def _fetch_one(self, sql, params):
+        try:
+            with self._connection() as conn:
+                return conn.execute(sql, params).fetchone()
+        except sqlite3.Error as e:
+            self._error(e)
+            return None
+
+    def get_username(self, username):
+        row = self._fetch_one("SELECT username FROM users WHERE lower(username) = lower(?)", (username,))
+        return row['username'] if row else None
+
+    def get_username_by_email(self, email):
+        if not email:
+            return None
+        row = self._fetch_one("SELECT username FROM users WHERE lower(email) = lower(?) AND email != ''", (email,))
+        return row['username'] if row else None
+
+    def find(self, username_or_email):
+        return self.get_username(username_or_email) or self.get_username_by_email(username_or_email)
+
+    def get(self, username):
+        row = self._fetch_one(
+            "SELECT password, email, created_at, role FROM users WHERE lower(username) = lower(?)", (username,))
+        return dict(row) if row else None
+
+    def add(self, username, data):
+        if self.get_username(username) is not None:
+            return False, "Username already exists"
+        if self.get_username_by_email(data.get('email', '')) is not None:
+            return False, "Email already exists"
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT INTO users (username, password, email, created_at, role) VALUES (?, ?, ?, ?, ?)",
+                    (username, data['password'], data.get('email', ''), data.get('created_at'),
+                     data.get('role', 'USER')))
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent signup for the same name or email
+            if self.get_username(username) is not None:
+                return False, "Username already exists"
+            return False, "Email already exists"
+        except sqlite3.Error as e:
+            self._error(e)
+            return False, "Error creating user"
+        return True, "User created successfully"
+
+    def update(self, username, **fields):
+        columns = [name for name in fields if name in USER_FIELDS]
+        if not columns:
+            return False
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        params = [fields[name] for name in columns] + [username]
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute(f"UPDATE users SET {assignments} WHERE lower(username) = lower(?)", params)
+        except sqlite3.Error as e:
+            self._error(e)
+            return False
+        return cursor.rowcount == 1
+
+    def add_reset_token(self, token, username, expiry):
+        try:
+            with self._connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO reset_tokens (token, username, expiry) VALUES (?, ?, ?)",
+                             (token, username, expiry))
+        except sqlite3.Error as e:
+            self._error(e)
+            return False
+        return True
+
+    def get_reset_token(self, token):
+        row = self._fetch_one("SELECT username, expiry FROM reset_tokens WHERE token = ?", (token,))
+        return dict(row) if row else None
+
+    def delete_reset_token(self, token):
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute("DELETE FROM reset_tokens WHERE token = ?", (token,))
+        except sqlite3.Error as e:
+            self._error(e)
+            return False
+        return cursor.rowcount == 1
+
+    def consume_reset_token(self, token):
+        try:
+            with self._connection() as conn:
+                row = conn.execute("DELETE FROM reset_tokens WHERE token = ? RETURNING username, expiry",
+                                   (token,)).fetchone()
+        except sqlite3.Error as e:
+            self._error(e)
+            return None
+        if row is None or datetime.fromisoformat(row['expiry']) < datetime.now():
+            return None
+        return row['username']
+
+    def sweep_reset_tokens(self):
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute("DELETE FROM reset_tokens WHERE expiry < ?", (datetime.now().isoformat(),))
+        except sqlite3.Error as e:
+            self._error(e)
+            return 0
+        return cursor.rowcount
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def migrate(users_file, journal_file, tokens_file, db_file):
+    """Import users and reset tokens from the JSON files into ``db_file``.
+
+    A user already in the database under exactly the same username is
+    updated, so the migration can be re-run. A user whose username or email
+    differs only in letter case from another user's is skipped: the unique
+    indexes reject it and it is listed in ``skipped``. Reset tokens with the
+    same token are replaced. Returns (users imported, tokens imported, skipped).
+    """
+    SqliteUserStore(db_file)
+    users = UserJournal(users_file, journal_file).load()
+    tokens = _read_json(tokens_file)
+    skipped = []
+    conn = sqlite3.connect(db_file)
+    try:
+        with conn:
+            for username, data in users.items():
+                try:
+                    conn.execute(
+                        # Not INSERT OR REPLACE: that resolves a lower(email) or lower(username)
+                        # conflict by deleting the other user's row instead of raising
+                        "INSERT INTO users (username, password, email, created_at, role) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(username) DO UPDATE SET password = excluded.password, email = excluded.email, "
+                        "created_at = excluded.created_at, role = excluded.role",
+                        (username, data['password'], data.get('email', ''), data.get('created_at'),
+                         data.get('role', 'USER')))
+                except sqlite3.IntegrityError:
+                    skipped.append(username)
+            conn.executemany(
+                "INSERT OR REPLACE INTO reset_tokens (token, username, expiry) VALUES (?, ?, ?)",
+                [(token, data['username'], data['expiry']) for token, data in tokens.items()])
+    finally:
+        conn.close()
+    return len(users) - len(skipped), len(tokens), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gyaan user store tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="import users.json and reset_tokens.json into SQLite")
+    migrate_parser.add_argument("--users", default="users.json")
+    migrate_parser.add_argument("--journal", default="users.journal.jsonl")
+    migrate_parser.add_argument("--tokens", default="reset_tokens.json")
+    migrate_parser.add_argument("--db", default="users.db")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        user_count, token_count, skipped = migrate(args.users, args.journal, args.tokens, args.db)
+        print(f"Imported {user_count} users and {token_count} reset tokens into {args.db}")
+        for username in skipped:
+            print(f"Skipped {username}: username or email conflicts with another user")
+
+
+if __name__ == "__main__":
+    main()